@@ -1,11 +1,9 @@
 import streamlit as st
-import os
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.document_loaders import UnstructuredFileLoader
-from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from utils.context import build_context
+from utils.embedding import embed_document, new_session_user
 
 st.set_page_config(
     page_title="FullstackGPT Home"
@@ -35,34 +33,14 @@ llm = ChatOpenAI(
     streaming=True,
 )
 
+# 세션마다 따로 색인해서 다른 방문자의 문서가 검색되지 않게 한다
+if "session_user" not in st.session_state:
+    st.session_state["session_user"] = new_session_user()
+
 @st.cache_data(show_spinner="Embedding file...")
-def embed_file(file):
+def embed_file(file, user):
     file_content = file.read()
-    file_path = f"./.cache/files/{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-        
-    # 문서
-    cache_dir = f"./.cache/embeddings/{file.name}"
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    # vector store
-    embeddings = OpenAIEmbeddings()
-    if os.path.exists(cache_dir):
-        vectorstore = FAISS.load_local(
-            cache_dir,
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
-    else:
-        vectorstore = FAISS.from_documents(docs, embeddings)
-        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
-        vectorstore.save_local(cache_dir)
+    retriever = embed_document(file.name, file_content, user)
 
     return retriever
 
@@ -77,7 +55,7 @@ def paint_history():
         send_message(message["message"], message["role"], save=False)
 
 def format_docs(docs):
-    return "\n\n".join(document.page_content for document in docs)
+    return build_context(docs, llm.model_name)
 
 prompt = ChatPromptTemplate.from_messages(
        [
@@ -108,7 +86,7 @@ st.markdown(text)
 
 
 if file:
-    retriever = embed_file(file)
+    retriever = embed_file(file, st.session_state["session_user"])
     send_message("I'm ready!", role="ai", save=False)
     paint_history()
     message = st.chat_input("Ask anything about your file..")
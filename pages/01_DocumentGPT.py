@@ -1,67 +1,25 @@
 import streamlit as st
-import os
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.document_loaders import UnstructuredFileLoader
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.vectorstores import FAISS
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain_core.callbacks.base import BaseCallbackHandler
+from utils.context import build_context
+from utils.embedding import index_document, list_documents, get_retriever, get_shared_index, document_fingerprint, new_session_user
+from utils.answer_cache import SemanticAnswerCache
 
 st.set_page_config(
     page_title="DocumentGPT"
 )
 
-class ChatCallbackHandler(BaseCallbackHandler):
-
-    def on_llm_start(self, *args, **kwargs):
-        with st.sidebar:
-            self.message_box = st.empty()
-
-    def on_llm_end(self, *args, **kwargs):
-        with st.sidebar:
-            st.write("llm ended!")
-
-    def on_llm_new_token(self, token, *args, **kwargs):
-        print(token)
-
 llm = ChatOpenAI(
     temperature=1,
     model_name="gpt-5-nano",
     streaming=True,
-    callbacks=[
-        ChatCallbackHandler()
-    ]
 )
 
 @st.cache_data(show_spinner="Embedding file...")
-def embed_file(file):
+def embed_file(file, workspace):
     file_content = file.read()
-    file_path = f"./.cache/files/{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-        
-    # 문서
-    cache_dir = f"./.cache/embeddings/{file.name}"
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    # vector store
-    embeddings = OpenAIEmbeddings()
-    if os.path.exists(cache_dir):
-        vectorstore = FAISS.load_local(
-            cache_dir,
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
-    else:
-        vectorstore = FAISS.from_documents(docs, embeddings)
-        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
-        vectorstore.save_local(cache_dir)
+    doc_id = index_document(workspace, file.name, file_content)
     # 메모리
     # memory = ConversationBufferMemory(
     #         llm=llm,
@@ -71,20 +29,28 @@ def embed_file(file):
     # )
     # def load_memory(_):
     #     return memory.load_memory_variables({})["chat_history"]
-    return retriever
+    return doc_id
+
+@st.cache_resource
+def get_answer_cache():
+    # 세션끼리 공유: 다른 사용자가 방금 한 질문도 바로 답한다
+    return SemanticAnswerCache(get_shared_index().embeddings)
+
+def save_message(message, role):
+    st.session_state["messages"].append({"message":message, "role":role})
 
 def send_message(message, role, save=True):
     with st.chat_message(role):
         st.markdown(message)
     if save:
-        st.session_state["messages"].append({"message":message, "role":role})
+        save_message(message, role)
 
 def paint_history():
     for message in st.session_state["messages"]:
         send_message(message["message"], message["role"], save=False)
 
 def format_docs(docs):
-    return "\n\n".join(document.page_content for document in docs)
+    return build_context(docs, llm.model_name)
 
 prompt = ChatPromptTemplate.from_messages(
        [
@@ -112,24 +78,49 @@ Use this chatbot to ask question to an AI about you file!
 Upload your files on the sidebar.
 """)
 
+# 워크스페이스 이름을 넣지 않으면 이 세션에서 올린 문서만 검색한다
+if "session_user" not in st.session_state:
+    st.session_state["session_user"] = new_session_user()
+
 with st.sidebar:
-    file = st.file_uploader("Upload a .txt .pdf or .docx file", type=[
+    workspace = st.text_input("Workspace (비워두면 이 세션 전용)").strip() or st.session_state["session_user"]
+    files = st.file_uploader("Upload a .txt .pdf or .docx file", type=[
         "pdf","txt","docx"
-    ])
-
-if file:
-    retriever = embed_file(file)
+    ], accept_multiple_files=True)
+
+uploaded_ids = [embed_file(file, workspace) for file in files]
+documents = list_documents(workspace)
+
+if documents:
+    with st.sidebar:
+        selected_ids = st.multiselect(
+            "Search in (비워두면 워크스페이스 전체)",
+            options=list(documents),
+            default=uploaded_ids,
+            format_func=lambda doc_id: documents[doc_id],
+        )
+        mode = st.selectbox("Retriever", ("hybrid", "vector", "keyword"))
+    retriever = get_retriever(workspace, selected_ids or None, mode=mode)
     send_message("I'm ready!", role="ai", save=False)
     paint_history()
     message = st.chat_input("Ask anything about your file..")
     if message:
         send_message(message, "human")
-        chain = {
-            "context": retriever | RunnableLambda(format_docs),
-            "question":RunnablePassthrough()
-        } | prompt | llm
-        response = chain.invoke(message)
-        send_message(response.content, "ai")
+        answer_cache = get_answer_cache()
+        scope = f"{document_fingerprint(workspace, selected_ids or None)}:{mode}:{llm.model_name}"
+        answer = answer_cache.lookup(scope, message)
+        if answer is None:
+            chain = {
+                "context": retriever | RunnableLambda(format_docs),
+                "question":RunnablePassthrough()
+            } | prompt | llm
+            # 토큰이 오는 대로 말풍선에 바로 그린다
+            with st.chat_message("ai"):
+                answer = st.write_stream(chunk.content for chunk in chain.stream(message))
+            save_message(answer, "ai")
+            answer_cache.put(scope, message, answer)
+        else:
+            send_message(answer, "ai")
 
 else:
     st.session_state["messages"]=[]
\ No newline at end of file
@@ -1,19 +1,13 @@
-from langchain_community.document_loaders import UnstructuredFileLoader
-from langchain_text_splitters import CharacterTextSplitter
+import os
 import streamlit as st
-from langchain_community.retrievers import WikipediaRetriever
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.callbacks import StreamingStdOutCallbackHandler
-from langchain_core.output_parsers import BaseOutputParser
-import json
-
-class JsonOutputParser(BaseOutputParser):
-    def parse(self, text):
-        text = text.replace("```","").replace("json","")
-        return json.loads(text)
-
-output_parser = JsonOutputParser()
+from utils.chunking import get_splitter
+from utils.loading import load_and_split
+from utils.quiz import QUIZ_FUNCTION, QuizOutputParser, map_reduce_quiz
+from utils.quiz_cache import QuizStore, quiz_key
+from utils.wiki import get_wikipedia
 
 st.set_page_config(
     page_title="QuizGPT",
@@ -27,6 +21,13 @@ llm = ChatOpenAI(
     model="gpt-5-2025-08-07",
     streaming=True,
     callbacks=[StreamingStdOutCallbackHandler()]
+).bind(
+    function_call={
+        "name": "create_quiz",
+    },
+    functions=[
+        QUIZ_FUNCTION,
+    ],
 )
 
 def format_docs(docs):
@@ -39,25 +40,23 @@ question_prompt = ChatPromptTemplate.from_messages(
                 """
     You are a helpful assistant that is role playing as a teacher.
          
-    Based ONLY on the following context make 10 questions to test the user's knowledge about the text.
+    Based ONLY on the following context make {count} questions to test the user's knowledge about the text.
     
     Each question should have 4 answers, three of them must be incorrect and one should be correct.
          
-    Use (o) to signal the correct answer.
-         
     Question examples:
          
     Question: What is the color of the ocean?
-    Answers: Red|Yellow|Green|Blue(o)
+    Answers: Red|Yellow|Green|Blue
          
     Question: What is the capital or Georgia?
-    Answers: Baku|Tbilisi(o)|Manila|Beirut
+    Answers: Baku|Tbilisi|Manila|Beirut
          
     Question: When was Avatar released?
-    Answers: 2007|2001|2009(o)|1998
+    Answers: 2007|2001|2009|1998
          
     Question: Who was Julius Caesar?
-    Answers: A Roman Emperor(o)|Painter|Actor|Model
+    Answers: A Roman Emperor|Painter|Actor|Model
          
     Your turn!
          
@@ -68,160 +67,33 @@ question_prompt = ChatPromptTemplate.from_messages(
     )
      
 questions_chain = {
-        "context": format_docs
-    } | question_prompt | llm
-
-formatting_prompt = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """
-    You are a powerful formatting algorithm.
-     
-    You format exam questions into JSON format.
-    Answers with (o) are the correct ones.
-     
-    Example Input:
-
-    Question: What is the color of the ocean?
-    Answers: Red|Yellow|Green|Blue(o)
-         
-    Question: What is the capital or Georgia?
-    Answers: Baku|Tbilisi(o)|Manila|Beirut
-         
-    Question: When was Avatar released?
-    Answers: 2007|2001|2009(o)|1998
-         
-    Question: Who was Julius Caesar?
-    Answers: A Roman Emperor(o)|Painter|Actor|Model
-    
-     
-    Example Output:
-     
-    ```json
-    {{ "questions": [
-            {{
-                "question": "What is the color of the ocean?",
-                "answers": [
-                        {{
-                            "answer": "Red",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Yellow",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Green",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Blue",
-                            "correct": true
-                        }},
-                ]
-            }},
-                        {{
-                "question": "What is the capital or Georgia?",
-                "answers": [
-                        {{
-                            "answer": "Baku",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Tbilisi",
-                            "correct": true
-                        }},
-                        {{
-                            "answer": "Manila",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Beirut",
-                            "correct": false
-                        }},
-                ]
-            }},
-                        {{
-                "question": "When was Avatar released?",
-                "answers": [
-                        {{
-                            "answer": "2007",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "2001",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "2009",
-                            "correct": true
-                        }},
-                        {{
-                            "answer": "1998",
-                            "correct": false
-                        }},
-                ]
-            }},
-            {{
-                "question": "Who was Julius Caesar?",
-                "answers": [
-                        {{
-                            "answer": "A Roman Emperor",
-                            "correct": true
-                        }},
-                        {{
-                            "answer": "Painter",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Actor",
-                            "correct": false
-                        }},
-                        {{
-                            "answer": "Model",
-                            "correct": false
-                        }},
-                ]
-            }}
-        ]
-     }}
-    ```
-    Your turn!
-
-    Questions: {context}
-
-""",
-        )
-    ]
-)
-
-formatting_chain = formatting_prompt | llm
+        "context": lambda x: format_docs(x["docs"]),
+        "count": lambda x: x["count"],
+    } | question_prompt | llm | QuizOutputParser()
 
 @st.cache_data(show_spinner="Loading file...")
 def split_file(file):
     file_content = file.read()
     file_path = f"./.cache/quiz_files/{file.name}"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
     with open(file_path, "wb") as f:
         f.write(file_content)
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100,
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
+    docs = load_and_split(file_path, get_splitter())
     return docs
 
-@st.cache_data(show_spinner="Making quiz..")
-def run_quiz_chain(_docs, topic):
-        chain = {"context": questions_chain} | formatting_chain | output_parser
-        return chain.invoke(_docs)
+@st.cache_resource
+def get_quiz_store():
+    return QuizStore()
+
+def run_quiz_chain(docs):
+        key = quiz_key(docs, None, llm.bound.model_name)
+        with st.spinner("Making quiz.."):
+            return get_quiz_store().get_or_create(key, 0, lambda: map_reduce_quiz(docs, questions_chain))
 
-@st.cache_data(show_spinner="Searching Wikipedia...")
 def wiki_search(term):
-    retriever = WikipediaRetriever(top_k_results=5, lang="ko")
-    docs = retriever.invoke(term)
+    # 검색 결과는 디스크에 남으므로 다른 세션이나 재시작 뒤에도 다시 받지 않는다
+    with st.spinner("Searching Wikipedia..."):
+        docs = get_wikipedia().documents(term, lang="ko", top_k=5)
     return docs
 
 with st.sidebar:
@@ -257,7 +129,7 @@ if not docs:
     """
     )
 else:
-    response = run_quiz_chain(docs, topic if topic else file.name)
+    response = run_quiz_chain(docs)
     st.write(response)
     with st.form("questions_form"):
         for question in response["questions"]:
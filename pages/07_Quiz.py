@@ -1,13 +1,16 @@
-from langchain_community.document_loaders import UnstructuredFileLoader
-from langchain_text_splitters import CharacterTextSplitter
+import os
 import streamlit as st
-from langchain_community.retrievers import WikipediaRetriever
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.callbacks import StreamingStdOutCallbackHandler
 from langchain_core.output_parsers import BaseOutputParser
 import json
-from langchain_core.output_parsers.openai_functions import JsonOutputFunctionsParser
+from utils.chunking import get_splitter
+from utils.loading import load_and_split
+from utils.quiz import QUIZ_FUNCTION, QuizOutputParser, map_reduce_quiz
+from utils.assistant import account_key
+from utils.quiz_cache import QuizStore, quiz_key
+from utils.wiki import get_wikipedia
 
 class JsonOutputParser(BaseOutputParser):
     def parse(self, text):
@@ -32,44 +35,6 @@ with st.sidebar:
         st.warning("API Key를 입력하세요")
 
 
-function = {
-    "name": "create_quiz",
-    "description": "function that takes a list of questions and answers and returns a quiz",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "questions": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "question": {
-                            "type": "string",
-                        },
-                        "answers": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "answer": {
-                                        "type": "string",
-                                    },
-                                    "correct": {
-                                        "type": "boolean",
-                                    },
-                                },
-                                "required": ["answer", "correct"],
-                            },
-                        },
-                    },
-                    "required": ["question", "answers"],
-                },
-            }
-        },
-        "required": ["questions"],
-    },
-}
-
 llm = ChatOpenAI(
     temperature=1,
     api_key=api_key,
@@ -81,7 +46,7 @@ llm = ChatOpenAI(
         "name": "create_quiz",
     },
     functions=[
-        function,
+        QUIZ_FUNCTION,
     ],
 )
 
@@ -95,7 +60,7 @@ question_prompt = ChatPromptTemplate.from_messages(
                 """
     You are a helpful assistant that is role playing as a teacher.
          
-    Based ONLY on the following context make 10 questions to test the user's knowledge about the text.
+    Based ONLY on the following context make {count} questions to test the user's knowledge about the text.
     
     Difficulty level: {difficulty}
 
@@ -258,30 +223,54 @@ formatting_chain = formatting_prompt | llm
 def split_file(file):
     file_content = file.read()
     file_path = f"./.cache/quiz_files/{file.name}"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
     with open(file_path, "wb") as f:
         f.write(file_content)
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100,
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
+    docs = load_and_split(file_path, get_splitter())
     return docs
 
-@st.cache_data(show_spinner="Making quiz..")
-def run_quiz_chain(_docs, topic, difficulty):
+@st.cache_resource
+def get_quiz_store():
+    # 세션끼리 공유: 백그라운드에서 만들고 있는 문제 세트도 다른 세션이 기다려서 쓴다
+    return QuizStore()
+
+DIFFICULTIES = {
+    "hard": "Make questions challenging and complex for advanced learners.",
+    "easy": "Make questions simple and straightforward for beginners.",
+}
+
+def quiz_job(docs, difficulty):
         chain = {
-            "context": format_docs,
+            "context": lambda x: format_docs(x["docs"]),
+            "count": lambda x: x["count"],
             "difficulty": lambda x: difficulty
-        } | question_prompt | llm | JsonOutputFunctionsParser()
-
-        return chain.invoke(_docs)
+        } | question_prompt | llm | QuizOutputParser()
+
+        key = quiz_key(docs, difficulty, llm.bound.model_name)
+        return key, lambda: map_reduce_quiz(docs, chain)
+
+def start_quizzes(docs):
+    # 버튼을 누르기 전에 두 난이도의 첫 세트를 백그라운드에서 함께 만들어 둔다
+    store = get_quiz_store()
+    for difficulty in DIFFICULTIES.values():
+        key, generate = quiz_job(docs, difficulty)
+        # 실패하면 이 API 키만 잠시 다시 시도하지 않는다 (키가 잘못된 세션 때문에 다른 세션이 막히지 않게)
+        store.ensure(key, 1, generate, account_key(api_key))
+
+def run_quiz_chain(docs, difficulty, variant=0):
+        store = get_quiz_store()
+        key, generate = quiz_job(docs, difficulty)
+        # 미리 만들고 있던 세트가 있으면 새로 만들지 않고 그 결과를 기다린다
+        with st.spinner("Making quiz.."):
+            quiz = store.get_or_create(key, variant, generate, account_key(api_key))
+        # 다시 풀기를 누르면 바로 보여줄 다음 세트를 미리 만든다
+        store.prefetch(key, variant, generate, account_key(api_key))
+        return quiz
 
-@st.cache_data(show_spinner="Searching Wikipedia...")
 def wiki_search(term):
-    retriever = WikipediaRetriever(top_k_results=5, lang="ko")
-    docs = retriever.invoke(term)
+    # 검색 결과는 디스크에 남으므로 다른 세션이나 재시작 뒤에도 다시 받지 않는다
+    with st.spinner("Searching Wikipedia..."):
+        docs = get_wikipedia().documents(term, lang="ko", top_k=5)
     return docs
 
 with st.sidebar:
@@ -317,6 +306,9 @@ if not docs:
     """
     )
 else:
+    if api_key:
+        start_quizzes(docs)
+
     st.write("문제 난이도를 선택하세요.")
     
     if "quiz_state" not in st.session_state:
@@ -361,8 +353,8 @@ else:
 
 
     if state["selected_button"] and state["questions"] is None:
-        difficulty = "Make questions challenging and complex for advanced learners." if state.get("difficulty") == "hard" else "Make questions simple and straightforward for beginners."
-        response = run_quiz_chain(docs, topic if topic else file.name, difficulty)
+        difficulty = DIFFICULTIES["hard"] if state.get("difficulty") == "hard" else DIFFICULTIES["easy"]
+        response = run_quiz_chain(docs, difficulty, state.get("variant", 0))
         state["questions"] = response["questions"]
 
     if state["selected_button_nm"] is not None:
@@ -435,6 +427,9 @@ else:
                 if st.button("🔄 다시 풀기", key="retry"):
                     st.session_state.quiz_state = {
                         "selected_button": state["selected_button"],
+                        "selected_button_nm": state["selected_button_nm"],
+                        "difficulty": state.get("difficulty"),
+                        "variant": state.get("variant", 0) + 1,
                         "questions": None,
                         "is_submitted": False,
                         "is_completed": False,
@@ -1,11 +1,11 @@
 import streamlit as st
+import openai
 from openai import OpenAI
 from datetime import datetime
-from bs4 import BeautifulSoup
-import requests
-import json
-import time
-from langchain_community.utilities import WikipediaAPIWrapper
+from utils.assistant import account_key, exists, get_assistant_registry, run_assistant, thread_messages
+from utils.fetch import open_page
+from utils.html_text import MAX_PAGE_BYTES, extract_text
+from utils.wiki import get_wikipedia
 
 st.set_page_config(
     page_title="Research Assistant",
@@ -23,9 +23,14 @@ with st.sidebar:
     else:
         st.warning("API Key를 입력하세요")
     
+    # 비워두면 세션마다 새 스레드, 이름을 넣으면 다음 방문에도 같은 대화를 이어간다
+    user = st.text_input("User (optional)").strip()
+    
     st.divider()
     
     if st.button("🗑️ Clear Chat History"):
+        if api_key:
+            get_assistant_registry().forget_thread(api_key, user)
         st.session_state.messages = []
         st.session_state.thread_id = None
         st.session_state.assistant_id = None
@@ -104,31 +109,18 @@ functions = [
 
 def wikipedia_search(query: str) -> str:
     try:
-        wiki = WikipediaAPIWrapper()
-        result = wiki.run(query)
-        return result
+        return get_wikipedia().text(query)
     except Exception as e:
         return f"Wikipedia search error: {str(e)}"
 
 def web_scraper(url: str) -> str:
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']):
-            tag.decompose()
-        
-        text = soup.get_text(separator='\n', strip=True)
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        cleaned_text = '\n'.join(lines)
+        # 본문 글자 수를 채우면 그 뒤는 받지도 파싱하지도 않는다
+        with open_page(url, max_bytes=MAX_PAGE_BYTES) as page:
+            cleaned_text, truncated = extract_text(page.content, page.headers.get("Content-Type", ""))
         
-        if len(cleaned_text) > 10000:
-            cleaned_text = cleaned_text[:10000] + "\n\n...(content truncated for length)"
+        if truncated:
+            cleaned_text = cleaned_text + "\n\n...(content truncated for length)"
         
         return f"Content from {url}:\n\n{cleaned_text}"
     except Exception as e:
@@ -152,11 +144,9 @@ available_functions = {
     "file_saver": file_saver,
 }
 
-if st.session_state.assistant_id is None:
-    with st.spinner("Initializing assistant..."):
-        assistant = client.beta.assistants.create(
-            name="Research Assistant",
-            instructions="""You are a helpful research assistant that helps users gather information and save it to files.
+assistant_config = {
+    "name": "Research Assistant",
+    "instructions": """You are a helpful research assistant that helps users gather information and save it to files.
             
             When researching:
             1. Use wikipedia_search to find information
@@ -164,14 +154,43 @@ if st.session_state.assistant_id is None:
             3. When user asks to save, use file_saver to save the research report
             
             Be concise and helpful in your responses.""",
-            tools=functions,
-            model="gpt-4o-mini",
-        )
-        st.session_state.assistant_id = assistant.id
+    "tools": functions,
+    "model": "gpt-4o-mini",
+}
+registry = get_assistant_registry()
+
+# API 키가 바뀌면 다른 계정이므로 어시스턴트를 다시 찾고, 계정이나 사용자가 바뀌면 그 스레드로 갈아탄다
+account = account_key(api_key)
+if st.session_state.get("account") != account:
+    st.session_state.account = account
+    st.session_state.assistant_id = None
+if st.session_state.get("thread_owner") != (account, user):
+    st.session_state.thread_owner = (account, user)
+    st.session_state.thread_id = None
+    st.session_state.messages = []
+
+if st.session_state.assistant_id is None:
+    with st.spinner("Initializing assistant..."):
+        # 설정이 같으면 예전에 만든 어시스턴트를 그대로 쓴다
+        st.session_state.assistant_id = registry.assistant_id(client, api_key, assistant_config)
 
 if st.session_state.thread_id is None:
-    thread = client.beta.threads.create()
-    st.session_state.thread_id = thread.id
+    st.session_state.thread_id = registry.thread_id(client, api_key, user)
+    if user:
+        try:
+            st.session_state.messages = thread_messages(client, st.session_state.thread_id)
+        except openai.NotFoundError:
+            registry.forget_thread(api_key, user)
+            st.session_state.thread_id = registry.thread_id(client, api_key, user)
+
+def answer(on_text):
+    return run_assistant(
+        client,
+        st.session_state.thread_id,
+        st.session_state.assistant_id,
+        available_functions,
+        on_text=on_text,
+    )
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -184,62 +203,42 @@ if prompt := st.chat_input("검색 도우미 입니다. 질문하세요"):
     
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        full_response = ""
         
-        client.beta.threads.messages.create(
-            thread_id=st.session_state.thread_id,
-            role="user",
-            content=prompt
-        )
-        
-        run = client.beta.threads.runs.create(
-            thread_id=st.session_state.thread_id,
-            assistant_id=st.session_state.assistant_id
-        )
+        try:
+            client.beta.threads.messages.create(
+                thread_id=st.session_state.thread_id,
+                role="user",
+                content=prompt
+            )
+        except openai.NotFoundError:
+            if exists(client.beta.threads.retrieve, st.session_state.thread_id):
+                raise
+            # 저장해 둔 스레드가 대시보드에서 지워졌으면 새 스레드에서 이어간다
+            registry.forget_thread(api_key, user)
+            st.session_state.thread_id = registry.thread_id(client, api_key, user)
+            client.beta.threads.messages.create(
+                thread_id=st.session_state.thread_id,
+                role="user",
+                content=prompt
+            )
         
         with st.spinner("Thinking..."):
-            while True:
-                run = client.beta.threads.runs.retrieve(
-                    thread_id=st.session_state.thread_id,
-                    run_id=run.id
-                )
-                
-                if run.status == "completed":
-                    break
-                elif run.status == "requires_action":
-                    tool_outputs = []
-                    
-                    for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                        function_name = tool_call.function.name
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        if function_name in available_functions:
-                            function_response = available_functions[function_name](**function_args)
-                            
-                            tool_outputs.append({
-                                "tool_call_id": tool_call.id,
-                                "output": function_response
-                            })
-                    
-                    run = client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=st.session_state.thread_id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-                elif run.status == "failed":
-                    st.error(f"Run failed: {run.last_error}")
-                    break
-                
-                time.sleep(1)
-        
-        messages = client.beta.threads.messages.list(
-            thread_id=st.session_state.thread_id
-        )
+            try:
+                run, full_response = answer(message_placeholder.markdown)
+            except openai.NotFoundError:
+                if exists(client.beta.assistants.retrieve, st.session_state.assistant_id):
+                    raise
+                # 어시스턴트만 지워진 경우: 어시스턴트를 새로 만들고 사용자의 스레드는 그대로 쓴다
+                registry.forget_assistant(api_key, assistant_config)
+                st.session_state.assistant_id = registry.assistant_id(client, api_key, assistant_config)
+                run, full_response = answer(message_placeholder.markdown)
+            except openai.APIStatusError as e:
+                # 키/한도/이미 실행 중인 run 같은 오류는 다시 시도해도 같으므로 알리고 멈춘다
+                st.error(f"OpenAI API error ({e.status_code}): {e.message}")
+                st.stop()
         
-        for message in messages.data:
-            if message.role == "assistant":
-                full_response = message.content[0].text.value
-                break
+        if run.status == "failed":
+            st.error(f"Run failed: {run.last_error}")
         
         message_placeholder.markdown(full_response)
     
@@ -0,0 +1,96 @@
+"""A local stand-in for the MediaWiki API used by utils.wiki.
+
+Search for ``q`` returns the titles ``"q 0" .. "q n-1"`` (nothing for
+``NO_MATCH``), and every page has a one-line intro followed by a long
+"== History ==" section. Each request sleeps ``delay`` seconds so tests can
+see coalescing and parallel page fetches; ``max_in_flight`` records the
+most requests that were being served at once.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NO_MATCH = "nothing"
+
+
+def page_extract(title):
+    return f"{title} is a test article.\n\n== History ==\n" + "Lorem ipsum dolor sit amet. " * 300
+
+
+class StubMediaWikiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        lang = url.path.split("/")[1]
+        with stub.lock:
+            stub.requests.append((lang, params))
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+        try:
+            time.sleep(stub.delay)
+            if params.get("list") == "search":
+                query = params["srsearch"]
+                titles = [] if query == NO_MATCH else [f"{query} {i}" for i in range(int(params["srlimit"]))]
+                data = {"query": {"search": [{"ns": 0, "title": title} for title in titles]}}
+            else:
+                title = params["titles"]
+                data = {"query": {"pages": [{
+                    "ns": 0,
+                    "title": title,
+                    "extract": page_extract(title),
+                    "fullurl": f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                }]}}
+        finally:
+            with stub.lock:
+                stub.in_flight -= 1
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubMediaWiki:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubMediaWikiHandler)
+        self.server.stub = self
+
+    @property
+    def api_url(self):
+        # WIKI_SETTINGS["api_url"] / WIKIPEDIA_API_URL 형식
+        return f"http://127.0.0.1:{self.server.server_port}/{{lang}}/w/api.php"
+
+    def searches(self):
+        return [params["srsearch"] for _, params in self.requests if params.get("list") == "search"]
+
+    def page_requests(self):
+        return [params["titles"] for _, params in self.requests if "titles" in params]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # python -m tests.stub_mediawiki : 페이지를 WIKIPEDIA_API_URL=<출력된 주소>로 띄워 손으로 확인할 때
+    with StubMediaWiki() as stub:
+        print(stub.api_url)
+        threading.Event().wait()
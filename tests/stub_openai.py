@@ -0,0 +1,157 @@
+"""A local stand-in for the Assistants run endpoints used by utils.assistant.
+
+Every run asks for ``TOOL_CALLS`` once and then answers with ``ANSWER``.
+``StubServer`` can refuse streaming runs or streamed tool output submissions
+(with status ``stream_error``) to exercise the polling fallback.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+THREAD_ID = "thread_1"
+RUN_ID = "run_1"
+ANSWER = ["Hello ", "world"]
+TOOL_CALLS = [
+    {"id": f"call_{i}", "type": "function", "function": {"name": "web_scraper", "arguments": json.dumps({"url": f"https://example.com/{i}"})}}
+    for i in range(2)
+]
+
+
+def run_object(status, tool_calls=None):
+    run = {
+        "id": RUN_ID, "object": "thread.run", "created_at": int(time.time()), "thread_id": THREAD_ID,
+        "assistant_id": "asst_1", "status": status, "model": "gpt-4o-mini", "instructions": "", "tools": [],
+        "parallel_tool_calls": True, "tool_choice": "auto", "truncation_strategy": None, "usage": None,
+        "metadata": {}, "last_error": None, "required_action": None,
+    }
+    if tool_calls:
+        run["required_action"] = {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": tool_calls}}
+    return run
+
+
+def step_object(status):
+    return {
+        "id": "step_1", "object": "thread.run.step", "created_at": int(time.time()), "run_id": RUN_ID,
+        "assistant_id": "asst_1", "thread_id": THREAD_ID, "type": "tool_calls", "status": status,
+        "step_details": {"type": "tool_calls", "tool_calls": []},
+    }
+
+
+def message_object(text=None):
+    return {
+        "id": "msg_1", "object": "thread.message", "created_at": int(time.time()), "thread_id": THREAD_ID,
+        "run_id": RUN_ID, "assistant_id": "asst_1", "role": "assistant", "attachments": [], "metadata": {},
+        "status": "in_progress" if text is None else "completed",
+        "content": [] if text is None else [{"type": "text", "text": {"value": text, "annotations": []}}],
+    }
+
+
+def step_delta(tool_call):
+    return {"id": "step_1", "object": "thread.run.step.delta", "delta": {"step_details": {"type": "tool_calls", "tool_calls": [tool_call]}}}
+
+
+def text_delta(value):
+    return {"id": "msg_1", "object": "thread.message.delta", "delta": {"content": [{"index": 0, "type": "text", "text": {"value": value, "annotations": []}}]}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for name, data in events:
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests.append(("GET", self.path, None))
+        if "/messages" in self.path:
+            return self.send_json({"object": "list", "data": [message_object("".join(ANSWER))], "has_more": False, "first_id": "msg_1", "last_id": "msg_1"})
+        # 폴링할 때마다 한 단계씩 진행한다
+        if stub.status == "queued":
+            stub.status = "requires_action"
+        elif stub.status == "in_progress":
+            stub.status = "completed"
+        return self.send_json(run_object(stub.status, TOOL_CALLS if stub.status == "requires_action" else None))
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        stream = bool(body.get("stream"))
+        stub.requests.append(("POST", self.path, stream))
+
+        if self.path.endswith("/runs"):
+            if stream and not stub.stream_runs:
+                return self.send_json({"error": {"message": "streaming unavailable"}}, stub.stream_error)
+            if not stream:
+                stub.status = "queued"
+                return self.send_json(run_object("queued"))
+            stub.status = "requires_action"
+            events = [("thread.run.created", run_object("queued")), ("thread.run.step.created", step_object("in_progress"))]
+            for i, tool_call in enumerate(TOOL_CALLS):
+                # 인자는 두 번에 나눠 보낸다
+                events.append(("thread.run.step.delta", step_delta({**tool_call, "index": i, "function": {**tool_call["function"], "arguments": ""}})))
+                events.append(("thread.run.step.delta", step_delta({"index": i, "type": "function", "function": {"arguments": tool_call["function"]["arguments"]}})))
+            events.append(("thread.run.requires_action", run_object("requires_action", TOOL_CALLS)))
+            return self.send_events(events)
+
+        if self.path.endswith("/submit_tool_outputs"):
+            if stream and not stub.stream_submits:
+                return self.send_json({"error": {"message": "streaming unavailable"}}, stub.stream_error)
+            stub.tool_outputs.append(body["tool_outputs"])
+            if not stream:
+                stub.status = "in_progress"
+                return self.send_json(run_object("in_progress"))
+            stub.status = "completed"
+            events = [("thread.run.step.completed", step_object("completed")), ("thread.message.created", message_object())]
+            events += [("thread.message.delta", text_delta(value)) for value in ANSWER]
+            events.append(("thread.run.completed", run_object("completed")))
+            return self.send_events(events)
+
+        return self.send_json({"error": {"message": "not found"}}, 404)
+
+
+class StubServer:
+    def __init__(self, stream_runs=True, stream_submits=True, stream_error=500):
+        self.stream_runs = stream_runs
+        self.stream_submits = stream_submits
+        self.stream_error = stream_error
+        self.status = None
+        self.requests = []
+        self.tool_outputs = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.stub = self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # python -m tests.stub_openai : 페이지를 OPENAI_BASE_URL=<출력된 주소>로 띄워 손으로 확인할 때
+    with StubServer() as stub:
+        print(stub.base_url)
+        threading.Event().wait()
@@ -0,0 +1,62 @@
+"""A local web server standing in for the sites utils.fetch downloads.
+
+``StubWebServer(pages)`` serves ``pages[path] = (body, headers)`` and answers
+304 when a request's If-None-Match / If-Modified-Since matches the page's
+ETag / Last-Modified. Every request is recorded as ``(path, headers)``.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubWebHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests.append((self.path, dict(self.headers)))
+        if self.path not in stub.pages:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, headers = stub.pages[self.path]
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if (etag and self.headers.get("If-None-Match") == etag) or (
+            last_modified and self.headers.get("If-Modified-Since") == last_modified
+        ):
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubWebServer:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubWebHandler)
+        self.server.stub = self
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
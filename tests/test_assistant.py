@@ -0,0 +1,61 @@
+import threading
+import openai
+import pytest
+from openai import OpenAI
+from tests.stub_openai import ANSWER, THREAD_ID, TOOL_CALLS, StubServer
+from utils.assistant import run_assistant
+
+
+def run_with_stub(**options):
+    calls = []
+    lock = threading.Lock()
+
+    def web_scraper(url):
+        with lock:
+            calls.append(url)
+        return f"page {url}"
+
+    texts = []
+    with StubServer(**options) as stub:
+        client = OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        run, text = run_assistant(client, THREAD_ID, "asst_1", {"web_scraper": web_scraper}, on_text=texts.append)
+    return stub, run, text, texts, calls
+
+
+def expected_outputs():
+    return [{"tool_call_id": call["id"], "output": f"page https://example.com/{i}"} for i, call in enumerate(TOOL_CALLS)]
+
+
+def test_streamed_run_renders_text_and_runs_each_tool_once():
+    stub, run, text, texts, calls = run_with_stub()
+    assert run.status == "completed"
+    assert text == "".join(ANSWER)
+    assert texts == ["Hello ", "Hello world"]
+    assert sorted(calls) == [f"https://example.com/{i}" for i in range(2)]
+    assert stub.tool_outputs == [expected_outputs()]
+    assert not any(method == "GET" for method, _, _ in stub.requests)
+
+
+def test_falls_back_to_polling_without_streaming():
+    stub, run, text, texts, calls = run_with_stub(stream_runs=False)
+    assert run.status == "completed"
+    assert text == "".join(ANSWER)
+    assert texts == [text]
+    assert len(calls) == 2
+    assert stub.tool_outputs == [expected_outputs()]
+
+
+def test_polling_fallback_reuses_tool_outputs_from_the_stream():
+    # 도구는 스트림 도중 실행됐고 결과 제출 스트림만 실패한 경우: 도구를 다시 실행하지 않는다
+    stub, run, text, texts, calls = run_with_stub(stream_submits=False)
+    assert run.status == "completed"
+    assert text == "".join(ANSWER)
+    assert len(calls) == 2
+    assert stub.tool_outputs == [expected_outputs()]
+
+
+@pytest.mark.parametrize("status, error", [(400, openai.BadRequestError), (401, openai.AuthenticationError), (429, openai.RateLimitError)])
+def test_client_errors_are_raised_instead_of_polling(status, error):
+    # 폴링해도 같은 이유로 실패하므로 run을 새로 만들지 않는다
+    with pytest.raises(error):
+        run_with_stub(stream_runs=False, stream_error=status)
@@ -0,0 +1,95 @@
+import os
+import time
+import pytest
+import requests
+from tests.stub_web import StubWebServer
+from utils.fetch import PageCache, fetch
+
+BODY = b"<html><body>" + b"x" * 5000 + b"</body></html>"
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+PAGES = {
+    "/plain": (BODY, {"Content-Type": "text/html"}),
+    "/etag": (BODY, {"ETag": '"v1"'}),
+    "/last-modified": (BODY, {"Last-Modified": LAST_MODIFIED}),
+    "/no-store": (BODY, {"Cache-Control": "no-store"}),
+}
+
+
+@pytest.fixture
+def server():
+    with StubWebServer(dict(PAGES)) as server:
+        yield server
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def page_cache(tmp_path, **settings):
+    return PageCache(str(tmp_path / "web"), settings)
+
+
+def test_fresh_entry_is_served_without_a_request(server, session, tmp_path):
+    cache = page_cache(tmp_path)
+    first = fetch(server.url("/plain"), cache, session)
+    second = fetch(server.url("/plain"), cache, session)
+    assert (first.content, first.from_cache) == (BODY, False)
+    assert (second.content, second.from_cache) == (BODY, True)
+    assert second.headers["Content-Type"] == "text/html"
+    assert server.paths() == ["/plain"]
+
+
+@pytest.mark.parametrize("path, header, value", [
+    ("/etag", "If-None-Match", '"v1"'),
+    ("/last-modified", "If-Modified-Since", LAST_MODIFIED),
+])
+def test_stale_entry_is_revalidated_and_304_reuses_the_body(server, session, tmp_path, path, header, value):
+    # ttl 0: 저장된 페이지는 매번 서버에 확인한다
+    cache = page_cache(tmp_path, ttl=0)
+    fetch(server.url(path), cache, session)
+    page = fetch(server.url(path), cache, session)
+    assert (page.status, page.content, page.from_cache) == (200, BODY, True)
+    assert server.paths() == [path, path]
+    assert header not in server.requests[0][1]
+    assert server.requests[1][1][header] == value
+
+
+def test_partial_body_is_not_served_to_a_full_fetch(server, session, tmp_path):
+    cache = page_cache(tmp_path)
+    head = fetch(server.url("/plain"), cache, session, max_bytes=100)
+    assert head.content == BODY[:100]
+    # 앞부분만 필요한 요청은 저장된 앞부분을 쓰고, 전체가 필요한 요청은 다시 받는다
+    assert fetch(server.url("/plain"), cache, session, max_bytes=100).from_cache
+    full = fetch(server.url("/plain"), cache, session)
+    assert (full.content, full.from_cache) == (BODY, False)
+    assert fetch(server.url("/plain"), cache, session).from_cache
+    assert server.paths() == ["/plain", "/plain"]
+
+
+def test_no_store_responses_are_not_cached(server, session, tmp_path):
+    cache = page_cache(tmp_path)
+    for _ in range(2):
+        page = fetch(server.url("/no-store"), cache, session)
+        assert (page.content, page.from_cache) == (BODY, False)
+    assert server.paths() == ["/no-store", "/no-store"]
+    assert cache.get(server.url("/no-store")) is None
+
+
+def test_eviction_drops_least_recently_used_bodies_past_max_bytes(server, session, tmp_path):
+    cache = page_cache(tmp_path, max_bytes=2 * len(BODY))
+    urls = [server.url(path) for path in ("/plain", "/etag", "/last-modified")]
+    for url in urls:
+        fetch(url, cache, session)
+    # 읽은 순서를 확실히 하려고 mtime을 직접 정한다: /plain이 가장 최근에 쓰였다
+    now = time.time()
+    for age, url in zip((1, 3, 2), urls):
+        body_path = cache.paths(url)[1]
+        os.utime(body_path, (now - age, now - age))
+
+    cache.evict()
+    assert cache.get(urls[0]) is not None
+    assert cache.get(urls[1]) is None
+    assert not any(os.path.exists(path) for path in cache.paths(urls[1]))
+    assert cache.get(urls[2]) is not None
@@ -0,0 +1,86 @@
+import threading
+import time
+import pytest
+import requests
+from langchain_core.documents import Document
+from tests.stub_mediawiki import NO_MATCH, StubMediaWiki, page_extract
+from utils.wiki import NO_RESULT, WikipediaClient
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def make_client(stub, tmp_path, session):
+    # dump_dir은 비어 있으므로 모든 언어를 API로 찾는다
+    settings = {"api_url": stub.api_url, "dump_dir": str(tmp_path / "dumps")}
+    return WikipediaClient(str(tmp_path / "cache"), settings, session)
+
+
+def test_search_results_are_cached_on_disk(tmp_path, session):
+    with StubMediaWiki() as stub:
+        first = make_client(stub, tmp_path, session).search("Seoul", "en", 3)
+        requests_made = len(stub.requests)
+        # 새 클라이언트(다른 프로세스나 재시작)도 디스크에 남은 결과를 쓴다
+        second = make_client(stub, tmp_path, session).search("Seoul", "en", 3)
+        # 공백만 다른 질의도 같은 키다
+        spaced = make_client(stub, tmp_path, session).search("  Seoul ", "en", 3)
+    assert second == spaced == first
+    assert requests_made == 4
+    assert len(stub.requests) == requests_made
+
+
+def test_concurrent_identical_searches_fetch_once(tmp_path, session):
+    with StubMediaWiki(delay=0.2) as stub:
+        client = make_client(stub, tmp_path, session)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.search("Busan", "ko", 2))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert stub.searches() == ["Busan"]
+    assert sorted(stub.page_requests()) == ["Busan 0", "Busan 1"]
+    assert len(results) == 5 and all(result == results[0] for result in results)
+
+
+def test_top_k_pages_are_fetched_in_parallel(tmp_path, session):
+    with StubMediaWiki(delay=0.3) as stub:
+        client = make_client(stub, tmp_path, session)
+        start = time.monotonic()
+        pages = client.search("Incheon", "en", 5)
+        elapsed = time.monotonic() - start
+    assert [page["title"] for page in pages] == [f"Incheon {i}" for i in range(5)]
+    assert stub.max_in_flight > 1
+    # 검색 1번 + 페이지 5개를 차례로 받으면 1.8초
+    assert elapsed < 1.5
+
+
+def test_documents_match_wikipedia_retriever(tmp_path, session):
+    with StubMediaWiki() as stub:
+        docs = make_client(stub, tmp_path, session).documents("Daegu", top_k=2)
+    assert all(isinstance(doc, Document) for doc in docs)
+    assert [doc.metadata for doc in docs] == [
+        {
+            "title": f"Daegu {i}",
+            "summary": f"Daegu {i} is a test article.",
+            "source": f"https://ko.wikipedia.org/wiki/Daegu_{i}",
+        }
+        for i in range(2)
+    ]
+    assert docs[0].page_content == page_extract("Daegu 0")[:4000]
+
+
+def test_text_matches_wikipedia_api_wrapper(tmp_path, session):
+    with StubMediaWiki() as stub:
+        client = make_client(stub, tmp_path, session)
+        text = client.text("Ulsan", top_k=2)
+        empty = client.text(NO_MATCH)
+    assert text == (
+        "Page: Ulsan 0\nSummary: Ulsan 0 is a test article.\n\n"
+        "Page: Ulsan 1\nSummary: Ulsan 1 is a test article."
+    )
+    assert empty == NO_RESULT
+    assert [lang for lang, _ in stub.requests][0] == "en"
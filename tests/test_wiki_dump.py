@@ -0,0 +1,72 @@
+import bz2
+import os
+import pytest
+from utils.wiki import WikipediaClient
+from utils.wiki_dump import WikipediaDump, build_dump_index, dump_path, iter_dump_articles
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "wikipedia")
+
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    build_dump_index(os.path.join(FIXTURES, "ko.xml"), "ko", dump_path("ko", str(tmp_path)))
+    # 압축된 덤프도 그대로 읽는다
+    source = tmp_path / "en.jsonl.bz2"
+    with open(os.path.join(FIXTURES, "en.jsonl"), "rb") as f:
+        source.write_bytes(bz2.compress(f.read()))
+    build_dump_index(str(source), "en", dump_path("en", str(tmp_path)))
+    return str(tmp_path)
+
+
+def test_xml_dump_keeps_articles_as_plain_text():
+    articles = {title: text for title, text, _ in iter_dump_articles(os.path.join(FIXTURES, "ko.xml"))}
+    # 넘겨주기 문서와 틀 이름공간은 건너뛴다
+    assert sorted(articles) == ["부산광역시", "서울특별시"]
+    text = articles["서울특별시"]
+    assert text.startswith("서울특별시는 대한민국의 수도이다.")
+    for markup in ("[[", "]]", "{{", "{|", "<ref", "파일:", "분류:", "숨김", "'''"):
+        assert markup not in text
+    assert text.endswith("조선의 수도 한양이었다. &")
+
+
+def test_title_match_ranks_first(dump_dir):
+    pages = WikipediaDump(dump_path("ko", dump_dir)).search("서울특별시")
+    assert [page["title"] for page in pages] == ["서울특별시"]
+    page = pages[0]
+    assert page["summary"] == "서울특별시는 대한민국의 수도이다."
+    assert "== 역사 ==" in page["content"]
+    assert page["source"] == "https://ko.wikipedia.org/wiki/서울특별시"
+
+
+def test_full_text_search_prefers_all_terms(dump_dir):
+    dump = WikipediaDump(dump_path("en", dump_dir))
+    titles = [page["title"] for page in dump.search("python programming", top_k=2)]
+    assert titles == ["Python (programming language)", "Monty Python"]
+    # 제목이 대소문자만 다른 문서는 하나만 남고, JSONL의 url을 그대로 쓴다
+    seoul = dump.search("seoul", top_k=5)
+    assert seoul[0]["title"] == "Seoul"
+    assert seoul[0]["source"] == "https://en.wikipedia.org/wiki?curid=1"
+    assert [page["title"] for page in seoul] == ["Seoul", "Busan"]
+    assert dump.search("nonexistentterm") == []
+
+
+class OfflineSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError("offline")
+
+
+def test_client_answers_from_dump_without_network(dump_dir, tmp_path):
+    session = OfflineSession()
+    client = WikipediaClient(root=str(tmp_path / "cache"), settings={"dump_dir": dump_dir}, session=session)
+    docs = client.documents("서울특별시", lang="ko")
+    assert [doc.metadata["title"] for doc in docs] == ["서울특별시"]
+    assert client.text("Seoul").startswith("Page: Seoul\nSummary: Seoul is the capital of South Korea.")
+    assert session.calls == 0
+    # 덤프에 없으면 API로 넘어간다
+    with pytest.raises(ConnectionError):
+        client.text("nonexistentterm")
+    assert session.calls == 1
@@ -0,0 +1,102 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_SETTINGS = {
+    # False면 정규화한 질문이 똑같을 때만 캐시된 답을 쓴다
+    # ada-002는 "2023년 매출"과 "2024년 매출"도 0.95를 넘기므로 임베딩 비교는 명시적으로 켤 때만 쓴다
+    "semantic": False,
+    # semantic: 코사인 유사도가 이 이상이고 숫자/고유명사가 모두 같아야 같은 질문으로 본다
+    "threshold": 0.98,
+    "ttl": 24 * 60 * 60,
+    "max_entries": 1000,
+}
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def key_terms(question):
+    # 숫자, 따옴표 안의 말, 대문자/숫자가 섞인 영어 단어(이름, 약어, 모델명)
+    # 문장 첫 단어는 이름이 아니어도 대문자로 시작하므로, 뒤가 전부 소문자면 뺀다
+    numbers = re.findall(r"\d+(?:[.,]\d+)*", question)
+    quoted = re.findall(r'["“「]([^"”」]+)["”」]', question)
+    names = [
+        match.group()
+        for match in re.finditer(r"\b[A-Za-z]*[A-Z0-9][A-Za-z0-9]*\b", question.strip())
+        if not (match.start() == 0 and match.group()[1:].islower())
+    ]
+    return frozenset(numbers + [term.lower() for term in quoted + names])
+
+
+class SemanticAnswerCache:
+    """Answers keyed by a document scope and the question embedding.
+
+    By default only an exact (normalised) question match is served. With
+    ``semantic`` on, other questions are embedded and compared against cached
+    questions for the same scope, and a hit also needs the same numbers and
+    names, since embeddings barely move when only those change. Entries expire after ``ttl`` seconds and the least
+    recently used ones are evicted past ``max_entries``.
+    """
+
+    def __init__(self, embeddings, settings=None):
+        self.embeddings = embeddings
+        self.settings = dict(settings or ANSWER_CACHE_SETTINGS)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+        return vector / (np.linalg.norm(vector) or 1)
+
+    def _expire(self, now):
+        expired = [
+            key for key, entry in self.entries.items()
+            if now - entry["created"] > self.settings["ttl"]
+        ]
+        for key in expired:
+            del self.entries[key]
+
+    def lookup(self, scope, question):
+        key = (scope, normalize_question(question))
+        with self.lock:
+            self._expire(time.time())
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]["answer"]
+            if not self.settings["semantic"]:
+                return None
+            if not any(entry_scope == scope for entry_scope, _ in self.entries):
+                return None
+
+        vector = self._embed(question)
+        terms = key_terms(question)
+        with self.lock:
+            best_key, best_score = None, self.settings["threshold"]
+            for entry_key, entry in self.entries.items():
+                if entry_key[0] != scope or entry["terms"] != terms:
+                    continue
+                score = float(np.dot(vector, entry["vector"]))
+                if score >= best_score:
+                    best_key, best_score = entry_key, score
+            if best_key is None:
+                return None
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key]["answer"]
+
+    def put(self, scope, question, answer):
+        key = (scope, normalize_question(question))
+        vector = self._embed(question) if self.settings["semantic"] else None
+        with self.lock:
+            self.entries[key] = {
+                "vector": vector,
+                "terms": key_terms(question),
+                "answer": answer,
+                "created": time.time(),
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.settings["max_entries"]:
+                self.entries.popitem(last=False)
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import openai
+from openai import AssistantEventHandler
+from utils.diskcache import atomic_write_json
+from utils.tools import ToolCallBatch
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "expired", "incomplete")
+# 스트리밍을 못 쓸 때의 폴링 간격: 짧게 시작해서 늘리고, 상태가 바뀌면 다시 줄인다
+POLL_SETTINGS = {
+    "initial": 0.25,
+    "factor": 1.5,
+    "max": 2.0,
+}
+ASSISTANT_REGISTRY_PATH = "./.cache/assistants.json"
+
+_registry_lock = threading.Lock()
+_registry = None
+
+
+class RunEventHandler(AssistantEventHandler):
+    """Collects the streamed answer text and starts tool calls as they complete."""
+
+    def __init__(self, functions, on_text=None, text=""):
+        super().__init__()
+        self.functions = functions
+        self.on_text = on_text
+        self.text = text
+        self.run = None
+        self.tools = ToolCallBatch(functions)
+
+    def follow_up(self):
+        # 이벤트 핸들러는 스트림 하나에만 쓸 수 있으므로 도구 결과를 제출할 때 새로 만든다
+        return RunEventHandler(self.functions, self.on_text, self.text)
+
+    def on_event(self, event):
+        if event.event.startswith("thread.run.") and not event.event.startswith("thread.run.step."):
+            self.run = event.data
+
+    def on_text_created(self, text):
+        if self.text:
+            self.text += "\n\n"
+
+    def on_text_delta(self, delta, snapshot):
+        self.text += delta.value or ""
+        if self.on_text:
+            self.on_text(self.text)
+
+    def on_tool_call_done(self, tool_call):
+        # requires_action을 기다리지 않고 인자가 다 온 도구부터 실행한다
+        if tool_call.type == "function":
+            self.tools.start(tool_call)
+
+
+def poll_run(client, thread_id, run, functions, batches=()):
+    delay = POLL_SETTINGS["initial"]
+    while run.status not in TERMINAL_STATUSES:
+        if run.status == "requires_action":
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            # 스트림에서 이미 실행한 도구 호출은 그 결과를 그대로 제출한다
+            tools = next((batch for batch in batches if batch.can_resume(tool_calls)), None)
+            tool_outputs = (tools or ToolCallBatch(functions)).results(tool_calls)
+            run = client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs,
+            )
+            delay = POLL_SETTINGS["initial"]
+            continue
+        time.sleep(delay)
+        delay = min(delay * POLL_SETTINGS["factor"], POLL_SETTINGS["max"])
+        status = run.status
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+        if run.status != status:
+            delay = POLL_SETTINGS["initial"]
+    return run
+
+
+def run_text(client, thread_id, run):
+    messages = client.beta.threads.messages.list(thread_id=thread_id, run_id=run.id)
+    for message in messages.data:
+        if message.role == "assistant":
+            return message.content[0].text.value
+    return ""
+
+
+def stream_failed(error):
+    # 스트림 연결이 끊겼거나, 스트림 중에 오류 이벤트가 왔거나, 서버 오류(5xx)인 경우만 폴링으로 이어 간다
+    # 키/요청/한도/"이미 실행 중인 run" 같은 4xx는 폴링해도 똑같이 실패하므로 그대로 올린다
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, openai.APIError)
+
+
+def run_assistant(client, thread_id, assistant_id, functions, on_text=None):
+    """Run the assistant on the thread and return ``(run, text)``.
+
+    Uses the streaming run API so text is passed to ``on_text`` as it arrives
+    and tool calls start as soon as their arguments are complete. If the
+    stream drops or the server fails (see ``stream_failed``), the run is
+    finished by polling with backoff, reusing the outputs of tool calls the
+    stream already started; other API errors are raised.
+    """
+    handler = RunEventHandler(functions, on_text)
+    batches = [handler.tools]
+    try:
+        with client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            event_handler=handler,
+        ) as stream:
+            stream.until_done()
+        while handler.run is not None and handler.run.status == "requires_action":
+            run = handler.run
+            tool_outputs = handler.tools.results(run.required_action.submit_tool_outputs.tool_calls)
+            handler = handler.follow_up()
+            handler.run = run
+            batches.append(handler.tools)
+            with client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs,
+                event_handler=handler,
+            ) as stream:
+                stream.until_done()
+        if handler.run is not None and handler.run.status in TERMINAL_STATUSES:
+            return handler.run, handler.text
+    except openai.APIError as e:
+        if not stream_failed(e):
+            raise
+
+    # 스트림이 끊겼거나 지원되지 않으면 폴링으로 마저 진행한다
+    run = handler.run
+    if run is None:
+        run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+    else:
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    run = poll_run(client, thread_id, run, functions, batches)
+    text = run_text(client, thread_id, run)
+    if on_text:
+        on_text(text)
+    return run, text
+
+
+def account_key(api_key):
+    # 어시스턴트와 스레드는 API 키의 계정에 속하므로 키 해시로 나눠 저장한다 (키 자체는 남기지 않는다)
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def exists(retrieve, object_id):
+    # NotFoundError가 어느 객체 때문인지 확인할 때 쓴다 (assistants.retrieve, threads.retrieve)
+    try:
+        retrieve(object_id)
+    except openai.NotFoundError:
+        return False
+    return True
+
+
+def assistant_fingerprint(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class AssistantRegistry:
+    """Assistant and thread ids kept on disk so sessions reuse them.
+
+    Assistants are stored per account under a fingerprint of their
+    configuration (name, instructions, tools, model), so a new one is only
+    created when the configuration changes. Threads are optionally stored
+    per user so a returning user continues the same conversation.
+    """
+
+    def __init__(self, path=ASSISTANT_REGISTRY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"assistants": {}, "threads": {}}
+
+    def save(self, data):
+        atomic_write_json(self.path, data, indent=2)
+
+    def update(self, section, key, value):
+        with self.lock:
+            data = self.load()
+            if value is None:
+                data[section].pop(key, None)
+            else:
+                data[section][key] = value
+            self.save(data)
+
+    def assistant_id(self, client, api_key, config):
+        key = f"{account_key(api_key)}:{assistant_fingerprint(config)}"
+        entry = self.load()["assistants"].get(key)
+        if entry is not None:
+            return entry["id"]
+        assistant = client.beta.assistants.create(**config)
+        self.update("assistants", key, {"id": assistant.id, "name": config.get("name"), "created": time.time()})
+        return assistant.id
+
+    def forget_assistant(self, api_key, config):
+        self.update("assistants", f"{account_key(api_key)}:{assistant_fingerprint(config)}", None)
+
+    def thread_id(self, client, api_key, user=None):
+        if not user:
+            return client.beta.threads.create().id
+        key = f"{account_key(api_key)}:{user}"
+        entry = self.load()["threads"].get(key)
+        if entry is not None:
+            return entry["id"]
+        thread = client.beta.threads.create()
+        self.update("threads", key, {"id": thread.id, "created": time.time()})
+        return thread.id
+
+    def forget_thread(self, api_key, user):
+        if user:
+            self.update("threads", f"{account_key(api_key)}:{user}", None)
+
+
+def get_assistant_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AssistantRegistry()
+        return _registry
+
+
+def thread_messages(client, thread_id, limit=50):
+    # 저장된 스레드로 돌아온 사용자의 이전 대화를 화면에 다시 그린다
+    messages = client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=limit)
+    return [
+        {"role": message.role, "content": "\n\n".join(part.text.value for part in message.content if part.type == "text")}
+        for message in reversed(messages.data)
+    ]
@@ -0,0 +1,65 @@
+from utils.chunking import get_model_encoding
+
+# 모델별로 프롬프트에 넣을 문맥 토큰 예산
+CONTEXT_BUDGETS = {
+    "gpt-5-nano": 3000,
+    "gpt-4o-mini": 3000,
+}
+DEFAULT_CONTEXT_BUDGET = 3000
+
+# 분할기가 100토큰씩 겹치게 자르므로, 이 길이 이상 겹치면 이어진 청크로 본다
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 1000
+# 남은 예산이 이보다 작으면 마지막 청크를 잘라 넣지 않는다
+MIN_TAIL_TOKENS = 50
+
+
+def merge_overlap(first, second):
+    if second in first:
+        return first
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def merge_chunks(docs):
+    # 같은 문서에서 겹치는 청크는 하나로 이어 붙이고, 순위는 더 높은 쪽을 따른다
+    groups = []
+    for doc in docs:
+        text = doc.page_content
+        source = doc.metadata.get("doc_id", doc.metadata.get("source"))
+        merged = False
+        for group in groups:
+            if group["source"] != source:
+                continue
+            joined = merge_overlap(group["text"], text) or merge_overlap(text, group["text"])
+            if joined is not None:
+                group["text"] = joined
+                merged = True
+                break
+        if not merged:
+            groups.append({"source": source, "text": text})
+    return [group["text"] for group in groups]
+
+
+def build_context(docs, model, budget=None, separator="\n\n"):
+    budget = budget or CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+    encoding = get_model_encoding(model)
+    separator_tokens = len(encoding.encode_ordinary(separator))
+
+    parts = []
+    used = 0
+    for text in merge_chunks(docs):
+        tokens = encoding.encode_ordinary(text)
+        cost = len(tokens) + (separator_tokens if parts else 0)
+        if used + cost <= budget:
+            parts.append(text)
+            used += cost
+            continue
+        remaining = budget - used - (separator_tokens if parts else 0)
+        if remaining >= MIN_TAIL_TOKENS:
+            parts.append(encoding.decode(tokens[:remaining]))
+        break
+    return separator.join(parts)
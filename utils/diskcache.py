@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+
+# 캐시 디렉터리 정리는 쓰기마다 하지 않고 이 간격(초)마다 한 번만 한다
+EVICT_INTERVAL = 60
+
+
+def temp_path(path):
+    # 프로세스/스레드마다 다른 임시 파일에 쓰고 os.replace로 바꿔치기한다
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def atomic_write(path, data):
+    """Replace ``path`` with ``data`` (bytes or str) so readers never see a partial file."""
+    tmp_path = temp_path(path)
+    if isinstance(data, bytes):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path, value, **kwargs):
+    atomic_write(path, json.dumps(value, ensure_ascii=False, **kwargs))
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict(root, suffix, max_entries=None, max_bytes=None, max_age=None, remove=remove_file):
+    """Remove the least recently used ``*suffix`` files under ``root``.
+
+    Files are ordered by mtime (readers touch what they use) and removed
+    oldest first while there are more than ``max_entries`` of them, they
+    take more than ``max_bytes``, or they are older than ``max_age`` seconds.
+    ``remove`` gets each path, so callers can delete companion files too.
+    """
+    entries = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    count = len(entries)
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    for mtime, size, path in entries:
+        if (
+            (max_entries is None or count <= max_entries)
+            and (max_bytes is None or total <= max_bytes)
+            and (max_age is None or now - mtime <= max_age)
+        ):
+            continue
+        remove(path)
+        count -= 1
+        total -= size
+
+
+class Periodic:
+    """``due()`` is true at most once every ``interval`` seconds, across threads."""
+
+    def __init__(self, interval=EVICT_INTERVAL):
+        self.interval = interval
+        self.last = None
+        self.lock = threading.Lock()
+
+    def due(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.last is not None and now - self.last < self.interval:
+                return False
+            self.last = now
+            return True
+
+
+class JsonCache:
+    """JSON entries on disk, one file per key, with a ttl and an entry cap.
+
+    Each file holds ``{"created": ..., field: value}``. Reads refresh the
+    mtime so eviction drops the least recently used entries first; eviction
+    runs at most once per ``evict_interval`` seconds of writes.
+    """
+
+    def __init__(self, root, field, ttl, max_entries, evict_interval=EVICT_INTERVAL):
+        self.root = root
+        self.field = field
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = Periodic(evict_interval)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            self.remove(key)
+            return None
+        os.utime(path)
+        return entry[self.field]
+
+    def put(self, key, value):
+        atomic_write_json(self.path(key), {"created": time.time(), self.field: value})
+        if self.evictions.due():
+            self.evict()
+
+    def remove(self, key):
+        remove_file(self.path(key))
+
+    def evict(self):
+        evict(self.root, ".json", max_entries=self.max_entries, max_age=self.ttl)
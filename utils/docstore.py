@@ -0,0 +1,156 @@
+import json
+import re
+import sqlite3
+import threading
+from langchain_core.documents import Document
+
+# 한 쿼리에 넣는 IN (?, ...) 값 수. SQLite의 변수 개수 제한(예전 빌드는 999)보다 작게 나눠 보낸다
+MAX_VARIABLES = 500
+
+
+def batched(values, size=MAX_VARIABLES):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def placeholders(values):
+    return ",".join("?" * len(values))
+
+
+class SQLiteDocstore:
+    """Chunk text and metadata kept on disk, read only for the rows a search needs."""
+
+    def __init__(self, path):
+        self.path = path
+        # sqlite 연결은 스레드끼리 공유할 수 없으므로 Streamlit 세션 스레드마다 따로 연다
+        self.local = threading.local()
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    chunk_id TEXT UNIQUE NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    user TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (user, doc_id)")
+            self.create_keyword_index(conn)
+            self.local.conn = conn
+        return conn
+
+    def create_keyword_index(self, conn):
+        # BM25 검색용 역색인. chunks 테이블을 내용으로 쓰고 트리거로 함께 갱신한다
+        conn.execute("PRAGMA recursive_triggers = ON")
+        conn.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, content='chunks', content_rowid='id', tokenize='unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            """
+        )
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def add(self, rows):
+        # rows: (id, chunk_id, Document)
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, chunk_id, doc_id, user, text, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        i,
+                        chunk_id,
+                        doc.metadata["doc_id"],
+                        doc.metadata["user"],
+                        doc.page_content,
+                        json.dumps(doc.metadata, ensure_ascii=False),
+                    )
+                    for i, chunk_id, doc in rows
+                ],
+            )
+
+    def delete(self, ids):
+        with self.connect() as conn:
+            conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+
+    def delete_from(self, first_id):
+        # 저장에 실패한 쓰기가 남긴, 아직 어느 인덱스 버전에도 없는 id를 지운다
+        with self.connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE id >= ?", (first_id,))
+
+    def chunk_ids(self, doc_id):
+        rows = self.connect().execute("SELECT chunk_id, id FROM chunks WHERE doc_id = ?", (doc_id,))
+        return dict(rows)
+
+    def all_ids(self):
+        return dict(self.connect().execute("SELECT chunk_id, id FROM chunks"))
+
+    def select_ids(self, user, doc_ids=None):
+        # 벡터 검색 필터: 이 사용자(와 문서)의 청크 id
+        conn = self.connect()
+        if doc_ids is None:
+            return [i for (i,) in conn.execute("SELECT id FROM chunks WHERE user = ?", (user,))]
+        ids = []
+        for batch in batched(doc_ids):
+            rows = conn.execute(
+                f"SELECT id FROM chunks WHERE user = ? AND doc_id IN ({placeholders(batch)})", [user] + batch
+            )
+            ids += [i for (i,) in rows]
+        return ids
+
+    def keyword_search(self, query, user, doc_ids=None, k=4):
+        # 한국어 조사가 붙은 단어("서울은")도 찾도록 각 단어를 접두어로 검색
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"*' for term in terms)
+        sql = """
+            SELECT chunks.id, bm25(chunks_fts) AS score FROM chunks_fts
+            JOIN chunks ON chunks.id = chunks_fts.rowid
+            WHERE chunks_fts MATCH ? AND chunks.user = ?
+        """
+        conn = self.connect()
+        if doc_ids is None:
+            rows = conn.execute(sql + " ORDER BY score LIMIT ?", (match, user, k)).fetchall()
+        else:
+            # 문서가 많으면 나눠서 찾고 점수로 합친다 (bm25 점수는 쿼리가 달라도 같은 기준이다)
+            rows = []
+            for batch in batched(doc_ids):
+                rows += conn.execute(
+                    sql + f" AND chunks.doc_id IN ({placeholders(batch)}) ORDER BY score LIMIT ?",
+                    [match, user] + batch + [k],
+                ).fetchall()
+            rows = sorted(rows, key=lambda row: row[1])[:k]
+        return [i for i, _ in rows]
+
+    def get(self, ids):
+        docs = {}
+        for batch in batched(ids):
+            rows = self.connect().execute(
+                f"SELECT id, chunk_id, text, metadata FROM chunks WHERE id IN ({placeholders(batch)})", batch
+            )
+            docs.update(
+                (i, Document(id=chunk_id, page_content=text, metadata=json.loads(metadata)))
+                for i, chunk_id, text, metadata in rows
+            )
+        return docs
@@ -0,0 +1,677 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_openai import OpenAIEmbeddings
+from utils.chunking import SPLITTER_SETTINGS, get_splitter
+from utils.diskcache import Periodic, atomic_write, atomic_write_json, remove_file
+from utils.docstore import SQLiteDocstore
+from utils.loading import iter_chunks
+from utils.vectorindex import INDEX_SETTINGS, VectorFile, VectorIndex, exact_search
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+FILES_DIR = "./.cache/files"
+INDEX_DIR = "./.cache/embeddings"
+SHARED_INDEX_DIR = os.path.join(INDEX_DIR, "shared", EMBEDDING_MODEL)
+CHUNKS_DIR = "./.cache/embedding_chunks"
+
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 30
+QUERY_CACHE_SIZE = 256
+
+DEFAULT_USER = "default"
+
+# 워크스페이스 이름 없이 올린 문서는 브라우저 세션 전용이다
+# 세션이 끝나면 다시 찾을 수 없으므로, 마지막으로 올린 뒤 이 시간(초)이 지나면 인덱스에서 지운다
+SESSION_USER_PREFIX = "session:"
+SESSION_DOCUMENT_TTL = 24 * 60 * 60
+EXPIRE_INTERVAL = 10 * 60
+
+# hybrid 검색: 벡터/키워드 결과를 각각 k * HYBRID_CANDIDATES개 가져와 RRF로 합친다
+HYBRID_CANDIDATES = 4
+RRF_K = 60
+
+# 백그라운드 재빌드가 실패하면 이 시간(초)만큼 다시 시작하지 않고, 실패할 때마다 두 배로 늘린다
+REBUILD_RETRY_AFTER = 60
+REBUILD_MAX_RETRY_AFTER = 60 * 60
+
+logger = logging.getLogger(__name__)
+
+_index_lock = threading.Lock()
+_shared_index = None
+
+
+def sha256(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(file_content, model=EMBEDDING_MODEL):
+    # 파일 이름이 아니라 내용 + 분할/임베딩 설정으로 캐시를 구분
+    settings = json.dumps({"model": model, **SPLITTER_SETTINGS}, sort_keys=True)
+    return sha256(sha256(file_content) + settings)
+
+
+class ChunkEmbeddingCache(Embeddings):
+    """Embeddings wrapper that stores one vector per unique chunk text on disk.
+
+    Missing chunks are embedded in batches with retry, and every batch is
+    written as soon as it comes back, so a failed run resumes from the chunks
+    that are already stored. Callers run several ``embed_documents`` calls in
+    a thread pool to embed concurrently.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        namespace=EMBEDDING_MODEL,
+        root=CHUNKS_DIR,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        on_progress=None,
+    ):
+        self.embeddings = embeddings
+        self.root = os.path.join(root, namespace)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+        # 같은 질문을 답변 캐시와 검색에서 두 번 임베딩하지 않도록
+        self.query_cache = OrderedDict()
+        self.query_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.f32")
+
+    def get(self, key):
+        # 벡터는 float32 원본 바이트로 저장한다
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        return np.fromfile(path, dtype="float32").tolist()
+
+    def put(self, key, vector):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, np.asarray(vector, dtype="float32").tobytes())
+
+    def _lookup(self, texts):
+        keys = [sha256(text) for text in texts]
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.get(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+        return keys, vectors, missing
+
+    def _batches(self, missing):
+        items = list(missing.items())
+        for i in range(0, len(items), self.batch_size):
+            yield items[i:i + self.batch_size]
+
+    def _report(self, done, total):
+        if self.on_progress is not None:
+            self.on_progress(done, total)
+
+    def _backoff(self, attempt):
+        return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, 1)
+
+    def _store_batch(self, batch, new_vectors, vectors):
+        for (key, _), vector in zip(batch, new_vectors):
+            self.put(key, vector)
+            vectors[key] = vector
+
+    def embed_documents(self, texts):
+        keys, vectors, missing = self._lookup(texts)
+        done = len(vectors)
+        total = done + len(missing)
+        for batch in self._batches(missing):
+            batch_texts = [text for _, text in batch]
+            for attempt in range(self.max_retries + 1):
+                try:
+                    new_vectors = self.embeddings.embed_documents(batch_texts)
+                    break
+                except Exception:
+                    if attempt == self.max_retries:
+                        raise
+                    time.sleep(self._backoff(attempt))
+            self._store_batch(batch, new_vectors, vectors)
+            done += len(batch)
+            self._report(done, total)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        with self.query_lock:
+            if text in self.query_cache:
+                self.query_cache.move_to_end(text)
+                return self.query_cache[text]
+        vector = self.embeddings.embed_query(text)
+        with self.query_lock:
+            self.query_cache[text] = vector
+            if len(self.query_cache) > QUERY_CACHE_SIZE:
+                self.query_cache.popitem(last=False)
+        return vector
+
+    async def aembed_query(self, text):
+        return await self.embeddings.aembed_query(text)
+
+
+def document_id(user, file_name, digest=None):
+    # 같은 사용자가 같은 이름으로 다시 올린 파일은 같은 문서로 보고 고쳐 쓴다
+    # 주인을 알 수 없는 업로드는 내용(digest)까지 넣어서, 이름만 같은 다른 파일이 덮어쓰지 못하게 한다
+    key = {"user": user, "file_name": file_name}
+    if digest is not None:
+        key["digest"] = digest
+    return sha256(json.dumps(key, sort_keys=True))
+
+
+def load_manifest(index_dir):
+    path = os.path.join(index_dir, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir, manifest):
+    atomic_write_json(os.path.join(index_dir, "manifest.json"), manifest, indent=2)
+
+
+def get_embeddings(on_progress=None):
+    return ChunkEmbeddingCache(
+        OpenAIEmbeddings(model=EMBEDDING_MODEL, max_retries=0),
+        on_progress=on_progress,
+    )
+
+
+def split_document(file_name, file_content, digest):
+    os.makedirs(FILES_DIR, exist_ok=True)
+    file_path = os.path.join(FILES_DIR, f"{digest[:16]}_{file_name}")
+    with open(file_path, "wb") as f:
+        f.write(file_content)
+
+    return iter_chunks(file_path, get_splitter())
+
+
+@contextmanager
+def file_lock(path):
+    # 여러 Streamlit 워커 프로세스가 같은 인덱스를 고칠 때 한 번에 하나만 쓰도록
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SharedIndex:
+    """One vector index holding every uploaded document, filtered by metadata.
+
+    The faiss index is opened read-only with mmap and chunk text lives in
+    SQLite, so worker processes share pages through the OS cache. Writers take
+    a file lock, write the index under a new name and then atomically replace
+    the manifest that points to it, so a failed write leaves the previous
+    version intact; readers reopen the index when the manifest changes. Raw vectors are also
+    appended to a contiguous file so the ANN index can be retrained from it
+    by ``rebuild`` without holding the lock.
+    """
+
+    def __init__(self, index_dir=SHARED_INDEX_DIR, settings=None):
+        self.index_dir = index_dir
+        self.lock_path = os.path.join(index_dir, "index.lock")
+        self.vectors_path = os.path.join(index_dir, "vectors.f32")
+        self.settings = settings or INDEX_SETTINGS
+        self.embeddings = get_embeddings()
+        self.lock = threading.Lock()
+        self.docstore = SQLiteDocstore(os.path.join(index_dir, "docstore.sqlite"))
+        self.index = None
+        self.manifest = None
+        self.manifest_mtime = None
+        self.build_thread = None
+        # (마지막 실패 시각, 연속 실패 횟수)
+        self.build_failure = None
+        self.expirations = Periodic(EXPIRE_INTERVAL)
+        with self.lock, file_lock(self.lock_path):
+            self.reload()
+
+    def empty_manifest(self):
+        return {
+            "model": EMBEDDING_MODEL,
+            "splitter": SPLITTER_SETTINGS,
+            "documents": {},
+            "next_id": 0,
+            # 저장할 때마다 올라가고, 인덱스 파일 이름에 쓴다
+            "version": 0,
+            "index": None,
+        }
+
+    def index_file(self, version):
+        return os.path.join(self.index_dir, f"index.{version}.faiss")
+
+    def reload(self):
+        # 메모리에서 고치던 manifest/인덱스를 버리고 디스크에 저장된 마지막 버전으로 되돌린다
+        self.index = None
+        self.manifest = None
+        self.manifest_mtime = None
+        if not self.refresh():
+            self.manifest = self.empty_manifest()
+
+    def refresh(self):
+        # 다른 프로세스가 인덱스를 바꿨으면 manifest와 mmap을 다시 연다
+        path = os.path.join(self.index_dir, "manifest.json")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return self.manifest is not None
+        if mtime == self.manifest_mtime:
+            return True
+        manifest = load_manifest(self.index_dir)
+        self.index = None
+        if manifest["index"] is not None:
+            self.index = VectorIndex.from_state(manifest["index"], self.settings)
+            self.index.open(self.index_file(manifest["version"]))
+        self.manifest = manifest
+        self.manifest_mtime = mtime
+        return True
+
+    def save(self, write_index=True):
+        # 새 버전의 인덱스 파일을 다 쓴 뒤에 manifest를 바꿔치기한다
+        # 중간에 실패하면 디스크에는 이전 manifest와 그 인덱스 파일이 그대로 남는다
+        # write_index=False: 인덱스는 그대로이고 manifest만 바뀐다 (mmap으로 연 IVF는 다시 쓸 수 없다)
+        version = self.manifest["version"]
+        if write_index:
+            version += 1
+            if self.index is not None:
+                self.index.save(self.index_file(version))
+        manifest = {
+            **self.manifest,
+            "version": version,
+            "index": self.index.state() if self.index is not None else None,
+        }
+        save_manifest(self.index_dir, manifest)
+        self.manifest = manifest
+        # 바로 전 버전은 방금 manifest를 읽은 다른 프로세스가 열 수 있으므로 하나 남겨 둔다
+        if write_index:
+            remove_file(self.index_file(version - 2))
+
+    def list_documents(self, user):
+        with self.lock:
+            self.refresh()
+            return {
+                doc_id: entry["file_name"]
+                for doc_id, entry in self.manifest["documents"].items()
+                if entry["user"] == user
+            }
+
+    def fingerprint(self, user, doc_ids=None):
+        # 검색 대상 문서들의 내용이 바뀌면 값이 바뀐다
+        with self.lock:
+            self.refresh()
+            digests = sorted(
+                (doc_id, entry["digest"])
+                for doc_id, entry in self.manifest["documents"].items()
+                if entry["user"] == user and (doc_ids is None or doc_id in doc_ids)
+            )
+        return sha256(json.dumps(digests))
+
+    def index_document(self, user, file_name, file_content, on_progress=None, replace=True):
+        digest = cache_key(file_content)
+        doc_id = document_id(user, file_name, None if replace else digest)
+
+        # manifest의 digest가 같으면 파싱 없이 그대로 사용
+        with self.lock:
+            self.refresh()
+            entry = self.manifest["documents"].get(doc_id)
+            if entry is not None and entry["digest"] == digest:
+                return doc_id
+            # 다른 사용자/세션이 같은 내용을 이미 올렸으면 그 청크와 벡터를 복사한다
+            source = next(
+                (other for other, entry in self.manifest["documents"].items() if entry["digest"] == digest),
+                None,
+            )
+
+        chunks, vectors = {}, {}
+        if source is not None:
+            chunks, vectors = self.copy_chunks(source, doc_id, user, file_name)
+        if not chunks:
+            chunks, vectors = self.embed_chunks(doc_id, user, file_name, file_content, digest, on_progress)
+
+        with self.lock, file_lock(self.lock_path):
+            self.refresh()
+            try:
+                needs_build = self.write_document(doc_id, user, file_name, digest, chunks, vectors)
+            except BaseException:
+                self.reload()
+                raise
+
+        if needs_build:
+            self.start_rebuild()
+        return doc_id
+
+    def copy_chunks(self, source, doc_id, user, file_name):
+        # 원본 문서가 그 사이 지워졌으면 빈 결과를 돌려주고, 호출한 쪽이 파싱한다
+        old_ids = self.docstore.chunk_ids(source)
+        if not old_ids:
+            return {}, {}
+        docs = self.docstore.get(old_ids.values())
+        found, stored = self.load_vectors(sorted(docs), self.index.dim)
+        chunks, vectors = {}, {}
+        for i, vector in zip(found, stored):
+            doc = docs[i]
+            chunk_id = f"{doc_id}:{doc.id.split(':')[1]}"
+            metadata = {**doc.metadata, "doc_id": doc_id, "user": user, "file_name": file_name}
+            chunks[chunk_id] = Document(page_content=doc.page_content, metadata=metadata)
+            vectors[chunk_id] = vector
+        if len(chunks) != len(old_ids):
+            return {}, {}
+        return chunks, vectors
+
+    def embed_chunks(self, doc_id, user, file_name, file_content, digest, on_progress=None):
+        # 문서: 파싱이 끝나기를 기다리지 않고 청크가 모이는 대로 임베딩 배치를 보낸다
+        # 캐시된 청크는 다시 임베딩하지 않으므로 잠금 밖에서 전부 준비해 둔다
+        embeddings = get_embeddings()
+        chunks = {}
+        vectors = {}
+        batch = []
+        pending = deque()
+        done = 0
+
+        def collect():
+            # on_progress는 Streamlit 위젯을 고치므로 풀 스레드가 아니라 여기서 부른다
+            nonlocal done
+            batch_ids, future = pending.popleft()
+            for chunk_id, vector in zip(batch_ids, future.result()):
+                vectors[chunk_id] = np.asarray(vector, dtype="float32")
+            done += len(batch_ids)
+            if on_progress is not None:
+                # 파싱이 끝나기 전에는 total이 지금까지 나온 청크 수다
+                on_progress(done, len(chunks))
+
+        with ThreadPoolExecutor(EMBEDDING_CONCURRENCY) as pool:
+            for doc in split_document(file_name, file_content, digest):
+                doc.metadata.update({"doc_id": doc_id, "user": user, "file_name": file_name})
+                chunk_id = f"{doc_id}:{sha256(doc.page_content)}"
+                if chunk_id in chunks:
+                    continue
+                chunks[chunk_id] = doc
+                batch.append(chunk_id)
+                if len(batch) == EMBEDDING_BATCH_SIZE:
+                    pending.append((batch, pool.submit(embeddings.embed_documents, [chunks[i].page_content for i in batch])))
+                    batch = []
+                # 결과를 기다리는 배치 수를 제한해서, 임베딩이 파싱보다 느려도 메모리가 쌓이지 않게 한다
+                while len(pending) >= EMBEDDING_CONCURRENCY * 2:
+                    collect()
+            if batch:
+                pending.append((batch, pool.submit(embeddings.embed_documents, [chunks[i].page_content for i in batch])))
+            while pending:
+                collect()
+        return chunks, vectors
+
+    def write_document(self, doc_id, user, file_name, digest, chunks, vectors):
+        # 잠금을 잡은 채로 부른다. 실패하면 호출한 쪽이 reload()로 되돌린다
+        # 이전에 저장 도중 실패한 쓰기가 남긴 행(manifest의 next_id 이후)은 어느 버전에도 없다
+        self.docstore.delete_from(self.manifest["next_id"])
+        old_ids = self.docstore.chunk_ids(doc_id)
+        removed = [old_ids[chunk_id] for chunk_id in old_ids if chunk_id not in chunks]
+        added = [chunk_id for chunk_id in chunks if chunk_id not in old_ids]
+        # 만료된 세션 문서도 같은 저장에서 함께 지운다
+        if self.expirations.due():
+            for expired in self.expired_documents(exclude=doc_id):
+                removed += self.docstore.chunk_ids(expired).values()
+                del self.manifest["documents"][expired]
+
+        # vector store: 이전 버전과 달라진 청크만 추가/삭제, mmap은 읽기 전용이므로 쓰기용으로 다시 연다
+        if self.index is None and added:
+            self.index = VectorIndex(len(vectors[added[0]]), self.settings)
+        elif self.index is not None and (added or removed):
+            self.index.open(self.index_file(self.manifest["version"]), mmap=False)
+        if added:
+            next_id = self.manifest["next_id"]
+            added_ids = list(range(next_id, next_id + len(added)))
+            added_vectors = [vectors[chunk_id] for chunk_id in added]
+            self.manifest["next_id"] = next_id + len(added)
+            self.docstore.add([(i, chunk_id, chunks[chunk_id]) for i, chunk_id in zip(added_ids, added)])
+            self.index.add(added_ids, added_vectors)
+            VectorFile(self.vectors_path, self.index.dim).write(added_ids, added_vectors)
+        if removed:
+            self.index.remove(removed)
+
+        self.manifest["documents"][doc_id] = {
+            "user": user,
+            "file_name": file_name,
+            "digest": digest,
+            "chunks": len(chunks),
+            "updated": time.time(),
+        }
+        self.save(write_index=bool(added or removed))
+        # 검색에 더 이상 쓰이지 않게 된 뒤에 본문을 지운다
+        if removed:
+            self.docstore.delete(removed)
+        # 쓰기용으로 연 인덱스 대신 저장된 파일을 mmap으로 다시 연다
+        self.reload()
+        return self.index is not None and self.index.needs_build()
+
+    def expired_documents(self, exclude=None):
+        now = time.time()
+        return [
+            doc_id
+            for doc_id, entry in self.manifest["documents"].items()
+            if doc_id != exclude
+            and entry["user"].startswith(SESSION_USER_PREFIX)
+            and now - entry.get("updated", 0) > SESSION_DOCUMENT_TTL
+        ]
+
+    def start_rebuild(self):
+        # ANN 학습은 오래 걸리므로 업로드 요청을 붙잡지 않고 백그라운드에서 한다
+        with self.lock:
+            if self.build_thread is not None and self.build_thread.is_alive():
+                return
+            if self.build_failure is not None:
+                failed_at, attempts = self.build_failure
+                delay = min(REBUILD_RETRY_AFTER * 2 ** (attempts - 1), REBUILD_MAX_RETRY_AFTER)
+                if time.monotonic() - failed_at < delay:
+                    return
+            self.build_thread = threading.Thread(target=self.rebuild_in_background, name="index-rebuild", daemon=True)
+            self.build_thread.start()
+
+    def rebuild_in_background(self):
+        # 실패해도 업로드는 기존 인덱스로 계속되므로, 기록만 하고 한동안 다시 시도하지 않는다
+        try:
+            self.rebuild()
+        except Exception:
+            with self.lock:
+                attempts = self.build_failure[1] + 1 if self.build_failure is not None else 1
+                self.build_failure = (time.monotonic(), attempts)
+            logger.exception("index rebuild failed (attempt %d)", attempts)
+        else:
+            with self.lock:
+                self.build_failure = None
+
+    def live_ids(self):
+        return sorted(i for i in self.docstore.all_ids().values() if i not in self.index.deleted)
+
+    def load_vectors(self, ids, dim):
+        """Return ``(found_ids, vectors)`` for ``ids`` from the vector file.
+
+        Ids past the end of the file are left out.
+        """
+        vector_file = VectorFile(self.vectors_path, dim)
+        rows = vector_file.rows
+        found = [int(i) for i in ids if int(i) < rows]
+        return found, vector_file.read(found)
+
+    def rebuild(self):
+        """Retrain the ANN index if ``needs_build`` says so.
+
+        Training runs without the writer lock; chunks added or removed in the
+        meantime are applied to the new index before it is swapped in.
+        Returns True if a new index was saved.
+        """
+        with self.lock, file_lock(self.lock_path):
+            self.refresh()
+            if self.index is None or not self.index.needs_build():
+                return False
+            index = self.index
+            snapshot_next_id = self.manifest["next_id"]
+            ids = self.live_ids()
+
+        built = VectorIndex(index.dim, self.settings)
+        built.build(ids, lambda batch: self.load_vectors(batch, index.dim))
+
+        with self.lock, file_lock(self.lock_path):
+            self.refresh()
+            if self.index is None or not self.index.needs_build():
+                # 다른 프로세스가 먼저 다시 만들었다
+                return False
+            live = set(self.live_ids())
+            removed = [i for i in ids if i not in live]
+            if removed:
+                built.remove(removed)
+            added = [i for i in sorted(live) if i >= snapshot_next_id]
+            if added:
+                built.add(*self.load_vectors(added, built.dim))
+            self.index = built
+            try:
+                self.save()
+            finally:
+                self.reload()
+        return True
+
+    def vector_search(self, query, user, doc_ids=None, k=4):
+        embedding = self.embeddings.embed_query(query)
+        with self.lock:
+            self.refresh()
+            if self.index is None:
+                return []
+            # next_id 이후의 행은 저장에 실패한 쓰기가 남긴 것이라 인덱스에 없다
+            next_id = self.manifest["next_id"]
+            ids = [
+                i for i in self.docstore.select_ids(user, doc_ids)
+                if i < next_id and i not in self.index.deleted
+            ]
+            if not ids:
+                return []
+            if len(ids) <= self.settings["exact_search_max"]:
+                # 문서 몇 개만 고른 경우: IVF는 nprobe개 리스트 밖의 청크를 못 찾으므로 직접 비교한다
+                hits = exact_search(embedding, *self.load_vectors(ids, self.index.dim), k)
+            elif len(ids) == self.index.size:
+                hits = self.index.search(embedding, k)
+            else:
+                hits = self.index.search(embedding, k, ids)
+        return [i for i, _ in hits]
+
+    def search(self, query, user, doc_ids=None, k=4, mode="vector"):
+        if mode == "vector":
+            top_k = self.vector_search(query, user, doc_ids, k)
+        elif mode == "keyword":
+            top_k = self.docstore.keyword_search(query, user, doc_ids, k)
+        elif mode == "hybrid":
+            candidates = max(k * HYBRID_CANDIDATES, k)
+            top_k = reciprocal_rank_fusion(
+                [
+                    self.vector_search(query, user, doc_ids, candidates),
+                    self.docstore.keyword_search(query, user, doc_ids, candidates),
+                ]
+            )[:k]
+        else:
+            raise ValueError(f"Unknown retriever mode: {mode}")
+
+        # 본문은 최종 top-k만 읽는다
+        docs = self.docstore.get(top_k)
+        return [docs[i] for i in top_k if i in docs]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            scores[i] = scores.get(i, 0) + 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class SharedIndexRetriever(BaseRetriever):
+    user: str
+    doc_ids: Optional[List[str]] = None
+    k: int = 4
+    # vector | keyword | hybrid
+    mode: str = "hybrid"
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return get_shared_index().search(query, self.user, self.doc_ids, self.k, self.mode)
+
+
+def new_session_user():
+    return f"{SESSION_USER_PREFIX}{uuid.uuid4().hex}"
+
+
+def get_shared_index():
+    global _shared_index
+    with _index_lock:
+        if _shared_index is None:
+            _shared_index = SharedIndex()
+        return _shared_index
+
+
+def index_document(user, file_name, file_content, on_progress=None, replace=True):
+    return get_shared_index().index_document(user, file_name, file_content, on_progress, replace)
+
+
+def list_documents(user):
+    return get_shared_index().list_documents(user)
+
+
+def document_fingerprint(user, doc_ids=None):
+    return get_shared_index().fingerprint(user, doc_ids)
+
+
+def get_retriever(user, doc_ids=None, k=4, mode="hybrid"):
+    return SharedIndexRetriever(user=user, doc_ids=doc_ids, k=k, mode=mode)
+
+
+def embed_document(file_name, file_content, user=None, on_progress=None):
+    # user가 없으면 공용 영역에 넣고, 같은 이름이라도 내용이 다르면 다른 문서로 둔다
+    replace = user is not None
+    user = user or DEFAULT_USER
+    doc_id = index_document(user, file_name, file_content, on_progress, replace)
+    return get_retriever(user, [doc_id])
+
+
+if __name__ == "__main__":
+    # python -m utils.embedding rebuild : 큰 인덱스는 업로드와 따로 여기서 다시 학습한다
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m utils.embedding rebuild")
+    start = time.perf_counter()
+    rebuilt = get_shared_index().rebuild()
+    index = get_shared_index().index
+    print(f"rebuilt={rebuilt} type={index.index_type if index else None} size={index.size if index else 0} in {time.perf_counter() - start:.1f}s")
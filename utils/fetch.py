@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from utils.diskcache import Periodic, atomic_write, evict, remove_file
+
+FETCH_CACHE_DIR = "./.cache/web"
+FETCH_SETTINGS = {
+    # 이 시간 안에 받은 페이지는 서버에 묻지 않고 바로 쓴다
+    "ttl": 60 * 60,
+    # 그 뒤로는 ETag/Last-Modified로 확인만 하고, 이보다 오래되면 지운다
+    "max_age": 7 * 24 * 60 * 60,
+    "max_bytes": 200 * 1024 * 1024,
+    "timeout": 15,
+    "pool_size": 16,
+    "chunk_bytes": 64 * 1024,
+}
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+}
+
+Page = namedtuple("Page", ["url", "status", "headers", "content", "from_cache"])
+
+_session_lock = threading.Lock()
+_session = None
+_cache_lock = threading.Lock()
+_page_cache = None
+
+
+def get_session():
+    # 연결을 재사용해서 같은 사이트로 가는 요청은 DNS/TCP/TLS를 다시 하지 않는다
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_SETTINGS["pool_size"],
+                pool_maxsize=FETCH_SETTINGS["pool_size"],
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+class PageCache:
+    """Fetched pages on disk with the validators needed to revalidate them.
+
+    Each URL is a metadata JSON file next to the raw body. Reads refresh the
+    entry's mtime so eviction drops the least recently used pages first once
+    the bodies pass ``max_bytes``, and entries older than ``max_age`` go.
+    Eviction runs at most once per ``EVICT_INTERVAL`` seconds of writes.
+    """
+
+    def __init__(self, root=FETCH_CACHE_DIR, settings=None):
+        self.root = root
+        self.settings = {**FETCH_SETTINGS, **(settings or {})}
+        self.evictions = Periodic()
+        os.makedirs(root, exist_ok=True)
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.root, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url):
+        meta_path, body_path = self.paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if time.time() - meta["fetched"] > self.settings["max_age"]:
+            self.remove(url)
+            return None
+        os.utime(body_path)
+        return meta, body
+
+    def put(self, url, meta, body=None):
+        meta_path, body_path = self.paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        if body is not None:
+            atomic_write(body_path, body)
+        atomic_write(meta_path, json.dumps(meta, ensure_ascii=False))
+        if body is not None and self.evictions.due():
+            self.evict()
+
+    def remove(self, url):
+        for path in self.paths(url):
+            remove_file(path)
+
+    def remove_body(self, body_path):
+        remove_file(body_path)
+        remove_file(body_path[: -len(".body")] + ".json")
+
+    def evict(self):
+        evict(
+            self.root,
+            ".body",
+            max_bytes=self.settings["max_bytes"],
+            max_age=self.settings["max_age"],
+            remove=self.remove_body,
+        )
+
+
+def get_page_cache():
+    global _page_cache
+    with _cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
+
+
+def iter_bytes(body, chunk_size):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+@contextmanager
+def open_page(url, cache=None, session=None, max_bytes=None):
+    """Open ``url`` through the shared session and the page cache.
+
+    Yields a ``Page`` whose ``content`` is an iterator of body chunks, so the
+    caller can stop reading early; at most ``max_bytes`` are downloaded and
+    the part that was read is cached (marked incomplete if it was cut).
+    Fresh entries (younger than ``ttl``) are served without any request;
+    older ones are revalidated with If-None-Match / If-Modified-Since and a
+    304 reuses the stored body.
+    """
+    cache = cache or get_page_cache()
+    session = session or get_session()
+    settings = cache.settings
+    chunk_size = settings["chunk_bytes"]
+
+    cached = cache.get(url)
+    if cached is not None and not cached[0].get("complete", True) and max_bytes is None:
+        # 앞부분만 저장된 페이지는 전체를 원하는 요청에 쓰지 않는다
+        cached = None
+    if cached is not None:
+        meta, body = cached
+        if time.time() - meta["fetched"] < settings["ttl"]:
+            yield Page(url, meta["status"], meta["headers"], iter_bytes(body, chunk_size), True)
+            return
+
+    headers = {}
+    if cached is not None:
+        if meta["headers"].get("ETag"):
+            headers["If-None-Match"] = meta["headers"]["ETag"]
+        if meta["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+    response = session.get(url, headers=headers, timeout=settings["timeout"], stream=True)
+    try:
+        if response.status_code == 304 and cached is not None:
+            meta["fetched"] = time.time()
+            cache.put(url, meta)
+            yield Page(url, meta["status"], meta["headers"], iter_bytes(body, chunk_size), True)
+            return
+        response.raise_for_status()
+
+        kept = {
+            name: response.headers[name]
+            for name in ("Content-Type", "ETag", "Last-Modified")
+            if name in response.headers
+        }
+        read = []
+        state = {"complete": False}
+
+        def chunks():
+            size = 0
+            for chunk in response.iter_content(chunk_size):
+                if max_bytes is not None and size + len(chunk) >= max_bytes:
+                    read.append(chunk[: max_bytes - size])
+                    yield read[-1]
+                    return
+                size += len(chunk)
+                read.append(chunk)
+                yield chunk
+            state["complete"] = True
+
+        yield Page(url, response.status_code, kept, chunks(), False)
+
+        if "no-store" not in response.headers.get("Cache-Control", ""):
+            meta = {
+                "url": url,
+                "status": response.status_code,
+                "headers": kept,
+                "fetched": time.time(),
+                "complete": state["complete"],
+            }
+            cache.put(url, meta, b"".join(read))
+    finally:
+        # 끝까지 읽지 않은 연결은 풀에 돌려주지 않고 닫는다
+        response.close()
+
+
+def fetch(url, cache=None, session=None, max_bytes=None):
+    with open_page(url, cache, session, max_bytes) as page:
+        return page._replace(content=b"".join(page.content))
@@ -0,0 +1,166 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+# 본문이 아닌 영역. 예전 BeautifulSoup 코드에서 decompose하던 태그와 같다
+SKIP_TAGS = {"script", "style", "nav", "footer", "header", "aside", "iframe"}
+MAX_PAGE_CHARS = 10000
+# 이만큼 받아도 글자 수를 못 채우면 거기서 멈춘다
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class TextExtractor(HTMLParser):
+    """Visible text lines of an HTML page, collected while it is fed.
+
+    Works on the stream without building a tree and sets ``done`` once more
+    than ``max_chars`` have been collected so the caller can stop feeding.
+    """
+
+    def __init__(self, max_chars=MAX_PAGE_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.lines = []
+        self.size = 0
+        self.skip = 0
+        self.done = False
+        # feed 경계에서 잘린 텍스트 노드를 다음 태그가 나올 때까지 모은다
+        self.pending = []
+
+    def flush(self):
+        text = "".join(self.pending)
+        self.pending = []
+        if self.done:
+            return
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            self.lines.append(line)
+            self.size += len(line) + 1
+            if self.size > self.max_chars:
+                self.done = True
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag in SKIP_TAGS:
+            self.skip += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush()
+
+    def handle_endtag(self, tag):
+        self.flush()
+        if tag in SKIP_TAGS and self.skip:
+            self.skip -= 1
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.pending.append(data)
+
+    def close(self):
+        super().close()
+        self.flush()
+
+
+def detect_encoding(content_type, head):
+    match = re.search(r"charset=([\w-]+)", content_type or "", re.IGNORECASE)
+    if match is None:
+        match = META_CHARSET.search(head)
+        name = match.group(1).decode("ascii") if match else "utf-8"
+    else:
+        name = match.group(1)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return "utf-8"
+
+
+def extract_text(chunks, content_type="", max_chars=MAX_PAGE_CHARS):
+    """Return ``(text, truncated)`` from an iterable of HTML byte chunks.
+
+    Stops pulling chunks as soon as the character budget is filled.
+    """
+    parser = TextExtractor(max_chars)
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(detect_encoding(content_type, chunk[:4096]))(errors="replace")
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+    else:
+        if decoder is not None:
+            parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+    text = "\n".join(parser.lines)
+    return text[:max_chars], parser.done or len(text) > max_chars
+
+
+def soup_text(content, max_chars=MAX_PAGE_CHARS):
+    # 비교용: 예전 web_scraper가 하던 방식 (전체 트리를 만든 뒤 자른다)
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    text = soup.get_text(separator="\n", strip=True)
+    text = "\n".join(line.strip() for line in text.split("\n") if line.strip())
+    return text[:max_chars], len(text) > max_chars
+
+
+def benchmark(content, repeat=3, chunk_size=64 * 1024):
+    """Seconds and peak memory of the old full-soup path vs streaming extraction."""
+    import time
+    import tracemalloc
+
+    def chunked():
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    runs = {
+        "beautifulsoup": lambda: soup_text(content),
+        "streaming": lambda: extract_text(chunked()),
+    }
+    results = {}
+    for name, run in runs.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text, _ = run()
+            best = min(best or float("inf"), time.perf_counter() - start)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": best, "peak_bytes": peak, "text": text}
+    return results
+
+
+if __name__ == "__main__":
+    # python -m utils.html_text [page size in MB]
+    import random
+    import sys
+
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rng = random.Random(0)
+    words = ["research", "assistant", "위키백과", "검색", "streamlit", "langchain", "문서", "page"]
+    parts = ["<html><head><style>body { color: red }</style><script>var x = 1;</script></head><body>",
+             "<header><nav><a href='/'>Home</a><a href='/about'>About</a></nav></header>"]
+    total = 0
+    while total < size * 1024 * 1024:
+        paragraph = " ".join(rng.choices(words, k=rng.randint(20, 80)))
+        part = f"<div class='post'><h2>{rng.choice(words)}</h2><p>{paragraph} &amp; <b>{rng.choice(words)}</b></p><script>track({total});</script></div>\n"
+        parts.append(part)
+        total += len(part.encode("utf-8"))
+    parts.append("<footer>copyright</footer></body></html>")
+    content = "".join(parts).encode("utf-8")
+
+    results = benchmark(content)
+    for name, row in results.items():
+        print(f"{name:<16}{row['seconds'] * 1000:>10.1f} ms{row['peak_bytes'] / 1024 / 1024:>10.1f} MB peak")
+    print("same text:", results["beautifulsoup"]["text"] == results["streaming"]["text"])
@@ -0,0 +1,115 @@
+import codecs
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from charset_normalizer import from_bytes
+from langchain_core.documents import Document
+from langchain_community.document_loaders import UnstructuredFileLoader
+from pypdf import PdfReader
+
+TEXT_EXTENSIONS = (".txt", ".md")
+# PDF는 페이지 묶음 단위로 프로세스 풀에서 추출한다
+PAGES_PER_TASK = 8
+LOADER_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# 텍스트 파일은 이 크기 정도씩 줄 단위로 끊어서 읽는다
+TEXT_BLOCK_CHARS = 200000
+# 텍스트 파일 인코딩은 앞부분 이만큼(바이트)으로 판단한다
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+
+def extract_pdf_pages(file_path, start, end):
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path):
+    page_count = len(PdfReader(file_path).pages)
+    ranges = iter([
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ])
+    if page_count <= PAGES_PER_TASK:
+        yield from extract_pdf_pages(file_path, 0, page_count)
+        return
+
+    # 결과를 기다리는 작업 수를 제한해서 메모리를 일정하게 유지한다
+    # Streamlit 서버는 스레드가 많으므로 fork 대신 spawn으로 워커를 띄운다
+    with ProcessPoolExecutor(LOADER_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for page_range in ranges:
+            pending.append(pool.submit(extract_pdf_pages, file_path, *page_range))
+            if len(pending) == LOADER_WORKERS * 2:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            page_range = next(ranges, None)
+            if page_range is not None:
+                pending.append(pool.submit(extract_pdf_pages, file_path, *page_range))
+            yield from pages
+
+
+def detect_encoding(file_path):
+    # UTF-8이면 그대로, 아니면 (CP949/EUC-KR로 저장한 한글 파일 등) charset_normalizer로 추정한다
+    # 추정할 수 없으면 None
+    with open(file_path, "rb") as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # 표본 끝에서 잘린 멀티바이트 문자는 오류로 보지 않는다
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    match = from_bytes(sample).best()
+    return match.encoding if match is not None else None
+
+
+def iter_text_blocks(file_path, encoding="utf-8"):
+    block = []
+    size = 0
+    with open(file_path, "r", encoding=encoding, errors="replace") as f:
+        for line in f:
+            block.append(line)
+            size += len(line)
+            if size >= TEXT_BLOCK_CHARS:
+                yield "".join(block)
+                block = []
+                size = 0
+    if block:
+        yield "".join(block)
+
+
+def iter_documents(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension in TEXT_EXTENSIONS:
+        encoding = detect_encoding(file_path)
+        # 인코딩을 알 수 없으면 Unstructured에 맡긴다
+        if encoding is not None:
+            for i, text in enumerate(iter_text_blocks(file_path, encoding)):
+                yield Document(page_content=text, metadata={"source": file_path, "block": i})
+            return
+
+    if extension == ".pdf":
+        found_text = False
+        for page, text in iter_pdf_pages(file_path):
+            if text.strip():
+                found_text = True
+                yield Document(page_content=text, metadata={"source": file_path, "page": page})
+        # 스캔본처럼 텍스트 레이어가 없으면 Unstructured로 다시 읽는다
+        if found_text:
+            return
+
+    yield from UnstructuredFileLoader(file_path).lazy_load()
+
+
+def iter_chunks(file_path, splitter):
+    # 페이지(블록)를 읽는 대로 잘라서 내보내므로 파싱이 끝나기 전에 임베딩을 시작할 수 있다
+    for doc in iter_documents(file_path):
+        yield from splitter.split_documents([doc])
+
+
+def load_and_split(file_path, splitter):
+    return list(iter_chunks(file_path, splitter))
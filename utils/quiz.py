@@ -0,0 +1,224 @@
+import json
+import math
+import re
+from difflib import SequenceMatcher
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.utils.json import parse_partial_json
+from utils.chunking import count_tokens_batch
+
+QUIZ_SETTINGS = {
+    "questions": 10,
+    # 한 번의 호출에 넣을 문맥 토큰 수. 문서가 이보다 짧으면 예전처럼 한 번만 호출한다
+    "group_tokens": 3000,
+    # 문서가 아무리 길어도 이 개수만큼만 나눠서 동시에 호출한다
+    "max_groups": 4,
+    "max_concurrency": 4,
+    # 중복으로 버려질 몫까지 그룹마다 조금 더 만든다
+    "overgenerate": 1.5,
+    # 질문 문장을 단어 단위로 비교해서 이 이상 같으면 같은 문제로 본다
+    "duplicate_ratio": 0.9,
+}
+
+QUIZ_FUNCTION = {
+    "name": "create_quiz",
+    "description": "function that takes a list of questions and answers and returns a quiz",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {
+                            "type": "string",
+                        },
+                        "answers": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "answer": {
+                                        "type": "string",
+                                    },
+                                    "correct": {
+                                        "type": "boolean",
+                                    },
+                                },
+                                "required": ["answer", "correct"],
+                            },
+                        },
+                    },
+                    "required": ["question", "answers"],
+                },
+            }
+        },
+        "required": ["questions"],
+    },
+}
+CORRECT_MARK = "(o)"
+
+
+def repair_json(text):
+    # 코드 블록, 앞뒤 설명문, 끝에 붙은 쉼표, 중간에 잘린 출력을 순서대로 고쳐 본다.
+    # (값, 출력이 온전했는지)를 돌려준다
+    fenced = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("no JSON object in output")
+    text = text[start:]
+    without_trailing_commas = re.sub(r",\s*([}\]])", r"\1", text)
+    for candidate in (text, without_trailing_commas):
+        try:
+            return json.JSONDecoder().raw_decode(candidate)[0], True
+        except json.JSONDecodeError:
+            pass
+    text = without_trailing_commas
+    try:
+        result = parse_partial_json(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(str(e)) from e
+    if result is None:
+        raise ValueError("could not repair JSON output")
+    return result, False
+
+
+def clean_question(question):
+    # 스키마에 맞지 않는 문제는 버리고, 흔한 실수("true" 문자열, "(o)" 표시)는 고친다
+    if not isinstance(question, dict):
+        return None
+    text = str(question.get("question") or "").strip()
+    answers = question.get("answers")
+    if not text or not isinstance(answers, list):
+        return None
+    cleaned = []
+    for answer in answers:
+        if not isinstance(answer, dict) or "answer" not in answer:
+            return None
+        value = str(answer["answer"]).strip()
+        correct = answer.get("correct", False)
+        if isinstance(correct, str):
+            correct = correct.strip().lower() == "true"
+        if value.endswith(CORRECT_MARK):
+            value = value[: -len(CORRECT_MARK)].strip()
+            correct = True
+        cleaned.append({"answer": value, "correct": bool(correct)})
+    if len(cleaned) < 2 or sum(answer["correct"] for answer in cleaned) != 1:
+        return None
+    return {"question": text, "answers": cleaned}
+
+
+class QuizOutputParser(BaseOutputParser):
+    """Quiz from a ``create_quiz`` function call, or from plain JSON text.
+
+    Malformed JSON is repaired locally and questions that do not fit the
+    schema are dropped, so only a reply with no usable question fails.
+    """
+
+    def parse_result(self, result, *, partial=False):
+        generation = result[0]
+        message = getattr(generation, "message", None)
+        function_call = message.additional_kwargs.get("function_call") if message is not None else None
+        if function_call:
+            return self.parse(function_call.get("arguments", ""))
+        return self.parse(generation.text)
+
+    def parse(self, text):
+        try:
+            data, complete = repair_json(text)
+        except ValueError as e:
+            raise OutputParserException(f"Could not parse quiz: {e}", llm_output=text) from e
+        questions = data.get("questions") if isinstance(data, dict) else None
+        if questions and not complete:
+            # 잘린 출력의 마지막 문제는 보기가 중간에 끊겼을 수 있다
+            questions = questions[:-1]
+        questions = [q for q in map(clean_question, questions or []) if q is not None]
+        if not questions:
+            raise OutputParserException("Quiz has no valid questions", llm_output=text)
+        return {"questions": questions}
+
+
+def sample_chunk_groups(docs, group_tokens, max_groups):
+    docs = list(docs)
+    lengths = count_tokens_batch([doc.page_content for doc in docs])
+    total = sum(lengths)
+    if total <= group_tokens or len(docs) < 2:
+        return [docs]
+
+    # 문서를 앞에서부터 같은 크기의 구간으로 나누고, 구간 가운데에서 예산만큼 이어진 청크를 뽑는다
+    group_count = min(max_groups, len(docs), math.ceil(total / group_tokens))
+    groups = []
+    for g in range(group_count):
+        start = len(docs) * g // group_count
+        end = len(docs) * (g + 1) // group_count
+        middle = (start + end) // 2
+        left = right = middle
+        used = lengths[middle]
+        while True:
+            grown = False
+            if right + 1 < end and used + lengths[right + 1] <= group_tokens:
+                right += 1
+                used += lengths[right]
+                grown = True
+            if left - 1 >= start and used + lengths[left - 1] <= group_tokens:
+                left -= 1
+                used += lengths[left]
+                grown = True
+            if not grown:
+                break
+        groups.append(docs[left:right + 1])
+    return groups
+
+
+def normalize_question(text):
+    return tuple(re.findall(r"\w+", text.lower()))
+
+
+def merge_questions(batches, count, duplicate_ratio):
+    # 그룹별 결과를 번갈아 가져와서 문서 전체에서 고르게 뽑히도록 한다
+    merged = []
+    seen = []
+    queues = [list(batch) for batch in batches]
+    while len(merged) < count and any(queues):
+        for queue in queues:
+            if not queue or len(merged) == count:
+                continue
+            question = clean_question(queue.pop(0))
+            if question is None:
+                continue
+            key = normalize_question(question["question"])
+            if any(
+                key == other or SequenceMatcher(None, key, other).ratio() >= duplicate_ratio
+                for other in seen
+            ):
+                continue
+            seen.append(key)
+            merged.append(question)
+    return merged
+
+
+def map_reduce_quiz(docs, chain, settings=None, **inputs):
+    """Make a quiz from sampled chunk groups in parallel and merge the results.
+
+    ``chain`` takes ``{"docs": [...], "count": n, **inputs}`` and returns
+    ``{"questions": [...]}``. Short documents are sent in a single call, long
+    ones are cut into at most ``max_groups`` groups of ``group_tokens`` so the
+    number and size of calls stays the same however long the document is.
+    """
+    settings = {**QUIZ_SETTINGS, **(settings or {})}
+    count = settings["questions"]
+    groups = sample_chunk_groups(docs, settings["group_tokens"], settings["max_groups"])
+    per_group = count if len(groups) == 1 else math.ceil(count * settings["overgenerate"] / len(groups))
+
+    results = chain.batch(
+        [{"docs": group, "count": per_group, **inputs} for group in groups],
+        config={"max_concurrency": settings["max_concurrency"]},
+        return_exceptions=True,
+    )
+    batches = [result.get("questions", []) for result in results if isinstance(result, dict)]
+    if not batches:
+        raise results[0]
+    return {"questions": merge_questions(batches, count, settings["duplicate_ratio"])}
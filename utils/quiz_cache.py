@@ -0,0 +1,149 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.diskcache import JsonCache
+
+QUIZ_CACHE_DIR = "./.cache/quizzes"
+QUIZ_CACHE_SETTINGS = {
+    "ttl": 7 * 24 * 60 * 60,
+    "max_entries": 200,
+    # 다시 풀기를 바로 보여줄 수 있도록 미리 만들어 둘 문제 세트 수 (0이면 끔)
+    "prefetch": 1,
+    "max_variants": 5,
+    "workers": 2,
+    # 백그라운드에서 기다리거나 만들고 있는 세트가 이만큼이면 더 예약하지 않는다
+    "max_queued": 8,
+    # 생성이 실패한 요청자(API 키)는 그 키를 이 시간(초)만큼 백그라운드로 다시 만들지 않고, 실패할 때마다 두 배로 늘린다
+    "retry_after": 30,
+    "max_retry_after": 10 * 60,
+}
+
+
+def quiz_key(docs, difficulty, model):
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(f"{difficulty}\0{model}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QuizStore:
+    """Generated quizzes on disk, keyed by document content, difficulty and model.
+
+    Each key holds a list of variants so "다시 풀기" can move on to a fresh
+    quiz. ``ensure`` and ``prefetch`` queue variants for a small background
+    pool (at most ``max_queued`` at a time), while ``get_or_create`` waits on
+    an in-flight generation or otherwise generates in the calling thread, so
+    a quiz someone is waiting for never queues behind speculative ones. After
+    a failed generation ``ensure`` backs off for that submitter and key
+    instead of resubmitting on every call; other submitters are unaffected.
+    Entries expire after ``ttl`` seconds and the least recently used files
+    are evicted past ``max_entries``.
+    """
+
+    def __init__(self, root=QUIZ_CACHE_DIR, settings=None):
+        self.root = root
+        self.settings = {**QUIZ_CACHE_SETTINGS, **(settings or {})}
+        self.lock = threading.Lock()
+        self.pending = {}
+        # 백그라운드 풀에 넣은 생성 (아직 끝나지 않은 것)
+        self.queued = set()
+        # (submitter, key) -> (마지막 실패 시각, 연속 실패 횟수)
+        self.failures = {}
+        self.pool = ThreadPoolExecutor(self.settings["workers"])
+        self.cache = JsonCache(root, "variants", self.settings["ttl"], self.settings["max_entries"])
+
+    def variants(self, key):
+        return self.cache.get(key) or []
+
+    def add(self, key, quiz):
+        with self.lock:
+            variants = self.variants(key)[: self.settings["max_variants"] - 1] + [quiz]
+            self.cache.put(key, variants)
+        return len(variants) - 1
+
+    def _generate(self, key, generate, future, submitter):
+        try:
+            result = self.add(key, generate())
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        # 먼저 끝난 생성이 아직 돌고 있는 다른 생성을 목록에서 지우지 않도록 자기 future만 뺀다
+        with self.lock:
+            self.pending[key].remove(future)
+            if not self.pending[key]:
+                del self.pending[key]
+            self.queued.discard(future)
+            if error is None:
+                self.failures.pop((submitter, key), None)
+            else:
+                attempts = self.failures.get((submitter, key), (0, 0))[1] + 1
+                self.failures[(submitter, key)] = (time.time(), attempts)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _start(self, key):
+        # lock을 잡은 상태에서 부른다. 다른 호출이 기다릴 수 있도록 pending에 먼저 올린다
+        future = Future()
+        self.pending.setdefault(key, []).append(future)
+        return future
+
+    def _submit(self, key, generate, submitter):
+        # lock을 잡은 상태에서 부른다
+        future = self._start(key)
+        self.queued.add(future)
+        self.pool.submit(self._generate, key, generate, future, submitter)
+        return future
+
+    def get_or_create(self, key, variant, generate, submitter=None):
+        variants = self.variants(key)
+        if len(variants) >= self.settings["max_variants"]:
+            # 더 만들지 않고 저장된 세트를 돌려가며 쓴다
+            return variants[variant % len(variants)]
+        if variant < len(variants):
+            return variants[variant]
+        with self.lock:
+            futures = list(self.pending.get(key, []))
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                # 미리 만들기가 실패했으면 아래에서 직접 만든다
+                continue
+            variants = self.variants(key)
+            if variant < len(variants):
+                return variants[variant]
+        # 사용자가 기다리는 생성은 백그라운드 풀에 줄 세우지 않고 이 스레드에서 바로 만든다
+        with self.lock:
+            future = self._start(key)
+        self._generate(key, generate, future, submitter)
+        future.result()
+        variants = self.variants(key)
+        return variants[min(variant, len(variants) - 1)]
+
+    def backing_off(self, key, submitter):
+        # lock을 잡은 상태에서 부른다
+        if (submitter, key) not in self.failures:
+            return False
+        failed_at, attempts = self.failures[(submitter, key)]
+        delay = min(self.settings["retry_after"] * 2 ** (attempts - 1), self.settings["max_retry_after"])
+        return time.time() - failed_at < delay
+
+    def ensure(self, key, count, generate, submitter=None):
+        # 저장된 것과 만드는 중인 것을 합쳐 count개가 되도록 백그라운드에서 만든다
+        count = min(count, self.settings["max_variants"])
+        with self.lock:
+            if self.backing_off(key, submitter):
+                return
+            missing = count - len(self.variants(key)) - len(self.pending.get(key, []))
+            missing = min(missing, self.settings["max_queued"] - len(self.queued))
+            for _ in range(missing):
+                self._submit(key, generate, submitter)
+
+    def prefetch(self, key, variant, generate, submitter=None):
+        self.ensure(key, variant + 1 + self.settings["prefetch"], generate, submitter)
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# 도구별 제한 시간(초). 여기에 없는 도구는 DEFAULT_TOOL_TIMEOUT
+TOOL_TIMEOUTS = {
+    "wikipedia_search": 20,
+    "web_scraper": 20,
+    "file_saver": 5,
+}
+DEFAULT_TOOL_TIMEOUT = 20
+# 한 번의 requires_action에 쓰는 전체 시간. 도구 하나가 늦어도 run이 만료되기 전에 제출한다
+TOOL_DEADLINE = 45
+TOOL_WORKERS = 8
+
+
+class ToolCallBatch:
+    """Tool calls of one ``requires_action`` step, run concurrently.
+
+    Calls can be started one by one as soon as their arguments are known
+    (``start``) and are all collected with ``results``. Every call gets an
+    output: failures, unknown tools and calls that miss their timeout or the
+    overall deadline are reported to the model as text instead of holding up
+    the run.
+    """
+
+    def __init__(self, functions, timeouts=None, deadline=TOOL_DEADLINE):
+        self.functions = functions
+        self.timeouts = {**TOOL_TIMEOUTS, **(timeouts or {})}
+        self.deadline = deadline
+        self.started = None
+        self.outputs = {}
+        self.futures = {}
+        self.closed = False
+        self.lock = threading.Lock()
+        # 시간이 지난 작업은 스레드를 멈출 수 없으므로, 배치마다 풀을 만들고 기다리지 않고 닫는다
+        self.pool = ThreadPoolExecutor(TOOL_WORKERS)
+
+    def start(self, tool_call):
+        with self.lock:
+            if tool_call.id in self.outputs or tool_call.id in self.futures:
+                return
+            if self.started is None:
+                self.started = time.monotonic()
+            name = tool_call.function.name
+            if name not in self.functions:
+                self.outputs[tool_call.id] = f"Unknown tool: {name}"
+                return
+            try:
+                args = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError as e:
+                self.outputs[tool_call.id] = f"Invalid arguments for {name}: {e}"
+                return
+            if not isinstance(args, dict):
+                # 모델이 객체가 아닌 JSON(배열, 문자열 등)을 보낸 경우
+                self.outputs[tool_call.id] = f"Invalid arguments for {name}: expected a JSON object"
+                return
+            future = self.pool.submit(self.functions[name], **args)
+            self.futures[tool_call.id] = (name, time.monotonic(), future)
+
+    def can_resume(self, tool_calls):
+        # 이미 시작했거나 끝낸 호출이 들어 있으면 이 배치로 결과를 모아야 도구가 두 번 실행되지 않는다
+        with self.lock:
+            known = [tool_call.id in self.outputs or tool_call.id in self.futures for tool_call in tool_calls]
+            return all(known) or (any(known) and not self.closed)
+
+    def results(self, tool_calls):
+        # submit_tool_outputs에 그대로 넘길 수 있도록 tool_calls 순서대로 돌려준다
+        for tool_call in tool_calls:
+            self.start(tool_call)
+        try:
+            for tool_call in tool_calls:
+                if tool_call.id in self.outputs:
+                    continue
+                name, submitted, future = self.futures[tool_call.id]
+                timeout = self.timeouts.get(name, DEFAULT_TOOL_TIMEOUT)
+                due = min(submitted + timeout, self.started + self.deadline)
+                try:
+                    self.outputs[tool_call.id] = str(future.result(timeout=max(0, due - time.monotonic())))
+                except TimeoutError:
+                    future.cancel()
+                    self.outputs[tool_call.id] = f"{name} timed out after {round(due - submitted)}s"
+                except Exception as e:
+                    self.outputs[tool_call.id] = f"{name} error: {e}"
+        finally:
+            self.closed = True
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        return [{"tool_call_id": tool_call.id, "output": self.outputs[tool_call.id]} for tool_call in tool_calls]
@@ -0,0 +1,332 @@
+import math
+import os
+import time
+import faiss
+import numpy as np
+from utils.diskcache import temp_path
+
+# type: flat | ivf_flat | hnsw | ivf_pq
+INDEX_SETTINGS = {
+    "type": os.environ.get("VECTOR_INDEX_TYPE", "flat"),
+    # 이보다 적으면 정확 검색(flat)으로도 충분히 빠르므로 ANN 인덱스를 만들지 않는다
+    "min_ann_vectors": 10000,
+    # IVF: nlist가 None이면 4 * sqrt(n) (학습 벡터 39개당 하나를 넘지 않게), nprobe가 클수록 recall이 오르고 느려진다
+    "nlist": None,
+    "nprobe": 16,
+    # HNSW: ef_search가 클수록 recall이 오르고 느려진다
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    # PQ: 벡터를 pq_m개의 pq_bits 코드로 압축 (pq_m은 차원의 약수여야 한다)
+    "pq_m": 64,
+    "pq_bits": 8,
+    # 삭제 표시된 벡터 비율이 이보다 크거나, 학습 이후 크기가 두 배가 되면 다시 빌드
+    "rebuild_ratio": 0.2,
+    # 학습은 표본으로 충분하다
+    "max_train_vectors": 100000,
+    # 빌드할 때 벡터를 이만큼씩 읽어서 넣는다 (메모리 상한)
+    "build_batch_size": 100000,
+    # 필터에 맞는 벡터가 이보다 적으면 ANN 인덱스 대신 그 벡터들과 직접 거리를 잰다
+    "exact_search_max": 2000,
+}
+
+
+# faiss가 k-means 학습에 요구하는 centroid당 최소 학습 벡터 수
+MIN_POINTS_PER_CENTROID = 39
+
+# 읽기 전용 mmap: 여러 워커 프로세스가 OS 페이지 캐시를 함께 쓴다
+# IVF는 inverted list를, flat/HNSW는 벡터 코드(IFC)를 mmap 한다
+IVF_MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+CODES_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def factory_string(index_type, n, settings):
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{settings['hnsw_m']},Flat"
+    nlist = settings["nlist"] or int(4 * math.sqrt(n))
+    # k-means는 centroid마다 학습 벡터가 MIN_POINTS_PER_CENTROID개는 있어야 제대로 나뉜다
+    train_size = min(n, settings["max_train_vectors"])
+    nlist = max(1, min(nlist, train_size // MIN_POINTS_PER_CENTROID))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{settings['pq_m']}x{settings['pq_bits']}"
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def create_index(index_type, dim, n, settings):
+    index = faiss.index_factory(dim, factory_string(index_type, n, settings))
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = settings["ef_construction"]
+    return index
+
+
+def train_index(index, vectors, settings):
+    if index.is_trained:
+        return
+    if len(vectors) > settings["max_train_vectors"]:
+        rng = np.random.default_rng(0)
+        vectors = vectors[rng.choice(len(vectors), settings["max_train_vectors"], replace=False)]
+    index.train(vectors)
+
+
+def set_search_params(index, index_type, settings):
+    params = faiss.ParameterSpace()
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params.set_index_parameter(index, "nprobe", settings["nprobe"])
+    elif index_type == "hnsw":
+        params.set_index_parameter(index, "efSearch", settings["ef_search"])
+
+
+def search_parameters(index_type, settings, selector):
+    # params를 넘기면 ParameterSpace로 정한 값 대신 이 값을 쓰므로 nprobe/efSearch도 함께 넣는다
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=settings["nprobe"])
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=settings["ef_search"])
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_search(vector, ids, vectors, k):
+    """Return the ``k`` nearest ``(id, distance)`` pairs among ``vectors`` (L2, like the index)."""
+    if not len(ids):
+        return []
+    distances = ((as_vectors(vectors) - as_vectors(vector)) ** 2).sum(axis=1)
+    order = np.argsort(distances, kind="stable")[:k]
+    return [(int(ids[i]), float(distances[i])) for i in order]
+
+
+def as_vectors(vectors):
+    return np.ascontiguousarray(vectors, dtype="float32")
+
+
+def as_ids(ids):
+    return np.ascontiguousarray(ids, dtype="int64")
+
+
+class VectorFile:
+    """float32 vectors stored contiguously, row ``i`` holding the vector of id ``i``.
+
+    Ids are handed out in increasing order, so appends are sequential writes
+    and a rebuild reads the live rows through a memmap instead of opening a
+    file per chunk.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+
+    @property
+    def rows(self):
+        try:
+            return os.path.getsize(self.path) // (4 * self.dim)
+        except FileNotFoundError:
+            return 0
+
+    def write(self, ids, vectors):
+        ids = as_ids(ids)
+        vectors = as_vectors(vectors)
+        if not len(ids):
+            return
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+            if (np.diff(ids) == 1).all():
+                # 새로 받은 id는 연속이므로 한 번에 쓴다
+                f.seek(int(ids[0]) * 4 * self.dim)
+                f.write(vectors.tobytes())
+                return
+            for i, vector in zip(ids, vectors):
+                f.seek(int(i) * 4 * self.dim)
+                f.write(vector.tobytes())
+
+    def read(self, ids):
+        rows = self.rows
+        if not rows or not len(ids):
+            return np.empty((0, self.dim), dtype="float32")
+        data = np.memmap(self.path, dtype="float32", mode="r", shape=(rows, self.dim))
+        return np.array(data[as_ids(ids)])
+
+
+class VectorIndex:
+    """faiss index with stable int64 ids and a configurable ANN mode.
+
+    Starts as an exact flat index. Once the collection passes
+    ``min_ann_vectors``, ``needs_build`` asks the caller to run ``build`` over
+    every live id, which trains the configured IVF/HNSW/PQ index.
+    """
+
+    def __init__(self, dim, settings=None):
+        self.dim = dim
+        self.settings = dict(settings or INDEX_SETTINGS)
+        self.index_type = "flat"
+        self.index = create_index("flat", dim, 0, self.settings)
+        self.deleted = set()
+        self.built_size = 0
+
+    @classmethod
+    def from_state(cls, state, settings=None):
+        vector_index = cls(state["dim"], settings)
+        vector_index.index_type = state["type"]
+        vector_index.deleted = set(state["deleted"])
+        vector_index.built_size = state["built_size"]
+        return vector_index
+
+    def state(self):
+        return {
+            "dim": self.dim,
+            "type": self.index_type,
+            "deleted": sorted(self.deleted),
+            "built_size": self.built_size,
+        }
+
+    def open(self, path, mmap=True):
+        flags = 0
+        if mmap:
+            flags = IVF_MMAP_FLAGS if self.index_type.startswith("ivf") else CODES_MMAP_FLAGS
+        self.index = faiss.read_index(path, flags)
+
+    def save(self, path):
+        tmp_path = temp_path(path)
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+
+    @property
+    def size(self):
+        return self.index.ntotal - len(self.deleted)
+
+    def add(self, ids, vectors):
+        self.index.add_with_ids(as_vectors(vectors), as_ids(ids))
+
+    def remove(self, ids):
+        # HNSW는 삭제를 지원하지 않으므로 검색 때 걸러내고 다음 빌드에서 정리한다
+        if self.index_type == "hnsw":
+            self.deleted.update(int(i) for i in ids)
+        else:
+            self.index.remove_ids(as_ids(ids))
+
+    def needs_build(self):
+        target = self.settings["type"]
+        if target == "flat" or self.size < self.settings["min_ann_vectors"]:
+            return target == "flat" and self.index_type != "flat"
+        if self.index_type != target:
+            return True
+        if len(self.deleted) > self.settings["rebuild_ratio"] * self.index.ntotal:
+            return True
+        return self.size > 2 * self.built_size
+
+    def build(self, ids, load):
+        """Train the configured index and add ``ids`` to it.
+
+        ``load(ids)`` returns ``(found_ids, vectors)``; it is called for one
+        training sample and then batch by batch, so the full set of vectors is
+        never in memory at once. Returns the number of vectors added.
+        """
+        ids = as_ids(ids)
+        index_type = self.settings["type"]
+        if len(ids) < self.settings["min_ann_vectors"]:
+            index_type = "flat"
+        index = create_index(index_type, self.dim, len(ids), self.settings)
+        if not index.is_trained:
+            sample = ids
+            if len(ids) > self.settings["max_train_vectors"]:
+                rng = np.random.default_rng(0)
+                sample = np.sort(rng.choice(ids, self.settings["max_train_vectors"], replace=False))
+            train_index(index, as_vectors(load(sample)[1]), self.settings)
+        batch_size = self.settings["build_batch_size"]
+        for start in range(0, len(ids), batch_size):
+            found, vectors = load(ids[start:start + batch_size])
+            if len(found):
+                index.add_with_ids(as_vectors(vectors), as_ids(found))
+        self.index = index
+        self.index_type = index_type
+        self.deleted = set()
+        self.built_size = index.ntotal
+        return index.ntotal
+
+    def search(self, vector, k, ids=None):
+        """Return up to ``k`` ``(id, distance)`` pairs, considering only ``ids`` if given.
+
+        The id filter runs inside faiss while it scans candidates, so a
+        narrow filter still fills ``k`` results as far as the index reaches
+        (IVF only scans ``nprobe`` lists).
+        """
+        if self.index.ntotal == 0:
+            return []
+        params = None
+        if ids is None:
+            set_search_params(self.index, self.index_type, self.settings)
+        else:
+            selector = faiss.IDSelectorBatch(as_ids(ids))
+            params = search_parameters(self.index_type, self.settings, selector)
+        fetch_k = min(self.index.ntotal, k + len(self.deleted))
+        distances, ids = self.index.search(as_vectors([vector]), fetch_k, params=params)
+        results = [
+            (int(i), float(d))
+            for i, d in zip(ids[0], distances[0])
+            if i != -1 and int(i) not in self.deleted
+        ]
+        return results[:k]
+
+
+def benchmark(vectors, queries, k=10, settings=None):
+    """Compare recall@k and latency of every ANN mode against exact search."""
+    settings = dict(settings or INDEX_SETTINGS)
+    vectors = as_vectors(vectors)
+    queries = as_vectors(queries)
+    ids = np.arange(len(vectors))
+
+    def run(index_type, index, **params):
+        set_search_params(index, index_type, {**settings, **params})
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        latency = (time.perf_counter() - start) * 1000 / len(queries)
+        return found, latency
+
+    exact = create_index("flat", vectors.shape[1], len(vectors), settings)
+    exact.add_with_ids(vectors, as_ids(ids))
+    truth, exact_latency = run("flat", exact)
+    rows = [{"type": "flat", "params": "", "build_s": 0.0, "recall": 1.0, "ms_per_query": exact_latency}]
+
+    sweeps = {
+        "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+        "hnsw": [{"ef_search": ef} for ef in (16, 64, 256)],
+        "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    }
+    for index_type, params_list in sweeps.items():
+        start = time.perf_counter()
+        index = create_index(index_type, vectors.shape[1], len(vectors), settings)
+        train_index(index, vectors, settings)
+        index.add_with_ids(vectors, as_ids(ids))
+        build_s = time.perf_counter() - start
+
+        for params in params_list:
+            found, latency = run(index_type, index, **params)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            rows.append({
+                "type": index_type,
+                "params": ",".join(f"{key}={value}" for key, value in params.items()),
+                "build_s": build_s,
+                "recall": float(recall),
+                "ms_per_query": latency,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    # python -m utils.vectorindex [n] [dim]
+    import sys
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    rng = np.random.default_rng(0)
+    # 실제 임베딩처럼 군집이 있는 데이터
+    centers = rng.normal(size=(256, dim))
+    data = centers[rng.integers(0, 256, n)] + 0.3 * rng.normal(size=(n, dim))
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    settings = {**INDEX_SETTINGS, "pq_m": min(INDEX_SETTINGS["pq_m"], dim // 4)}
+
+    print(f"n={n} dim={dim} queries=1000 k=10")
+    print(f"{'type':<10}{'params':<16}{'build_s':>9}{'recall':>9}{'ms/query':>10}")
+    for row in benchmark(data, data[rng.integers(0, n, 1000)], k=10, settings=settings):
+        print(f"{row['type']:<10}{row['params']:<16}{row['build_s']:>9.2f}{row['recall']:>9.3f}{row['ms_per_query']:>10.4f}")
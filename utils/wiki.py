@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.documents import Document
+from utils.diskcache import JsonCache
+from utils.fetch import get_session
+from utils.wiki_dump import WIKI_DUMP_DIR, WikipediaDump, dump_path
+
+WIKI_CACHE_DIR = "./.cache/wikipedia"
+WIKI_SETTINGS = {
+    # 테스트할 때는 로컬 목 서버 주소로 바꾼다
+    "api_url": os.environ.get("WIKIPEDIA_API_URL", "https://{lang}.wikipedia.org/w/api.php"),
+    "ttl": 24 * 60 * 60,
+    "max_entries": 1000,
+    "timeout": 10,
+    "workers": 8,
+    # WikipediaAPIWrapper / WikipediaRetriever 기본값과 같다
+    "max_query_length": 300,
+    "doc_content_chars_max": 4000,
+    # python -m utils.wiki_dump로 만든 {lang}.sqlite가 있으면 그 언어는 로컬에서 찾는다
+    "dump_dir": WIKI_DUMP_DIR,
+}
+NO_RESULT = "No good Wikipedia Search Result was found"
+
+_client_lock = threading.Lock()
+_client = None
+
+
+def search_key(query, lang, top_k):
+    normalized = " ".join(query.split())
+    return hashlib.sha256(json.dumps([normalized, lang, top_k], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class WikipediaClient:
+    """Wikipedia search shared by the Assistant and the quiz pages.
+
+    Talks to the MediaWiki API over the pooled HTTP session and fetches the
+    top-k pages in parallel. Results are kept on disk per (query, lang,
+    top_k) for ``ttl`` seconds, and concurrent identical searches wait for
+    the one already running instead of repeating it. Languages with a local
+    dump index are answered from it, falling back to the API on no match.
+    """
+
+    def __init__(self, root=WIKI_CACHE_DIR, settings=None, session=None):
+        self.root = root
+        self.settings = {**WIKI_SETTINGS, **(settings or {})}
+        self.session = session
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.dumps = {}
+        self.pool = ThreadPoolExecutor(self.settings["workers"])
+        self.cache = JsonCache(root, "pages", self.settings["ttl"], self.settings["max_entries"])
+
+    def dump(self, lang):
+        path = dump_path(lang, self.settings["dump_dir"])
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            # 색인을 다시 만들면 파일이 바뀌므로 새로 연다
+            if lang not in self.dumps or self.dumps[lang][0] != mtime:
+                self.dumps[lang] = (mtime, WikipediaDump(path))
+            return self.dumps[lang][1]
+
+    def api(self, lang, **params):
+        session = self.session or get_session()
+        response = session.get(
+            self.settings["api_url"].format(lang=lang),
+            params={"format": "json", "formatversion": 2, **params},
+            timeout=self.settings["timeout"],
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def search_titles(self, query, lang, top_k):
+        data = self.api(
+            lang,
+            action="query",
+            list="search",
+            srsearch=query[: self.settings["max_query_length"]],
+            srlimit=top_k,
+            srprop="",
+        )
+        return [result["title"] for result in data["query"]["search"]]
+
+    def fetch_page(self, title, lang):
+        data = self.api(
+            lang,
+            action="query",
+            prop="extracts|info",
+            explaintext=1,
+            inprop="url",
+            redirects=1,
+            titles=title,
+        )
+        pages = data.get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing") or "extract" not in pages[0]:
+            return None
+        page = pages[0]
+        content = page["extract"]
+        return {
+            "title": page["title"],
+            # 첫 번째 "== 절 ==" 앞까지가 요약(서론)이다
+            "summary": content.split("\n==", 1)[0].strip(),
+            "content": content,
+            "source": page.get("fullurl", ""),
+        }
+
+    def fetch(self, query, lang, top_k):
+        titles = self.search_titles(query, lang, top_k)
+        pages = self.pool.map(lambda title: self.fetch_page(title, lang), titles)
+        return [page for page in pages if page is not None]
+
+    def search(self, query, lang="ko", top_k=5):
+        dump = self.dump(lang)
+        if dump is not None:
+            pages = dump.search(query[: self.settings["max_query_length"]], top_k)
+            if pages:
+                return pages
+
+        key = search_key(query, lang, top_k)
+        pages = self.cache.get(key)
+        if pages is not None:
+            return pages
+
+        with self.lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.pending[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            pages = self.fetch(query, lang, top_k)
+            self.cache.put(key, pages)
+            future.set_result(pages)
+            return pages
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+
+    def documents(self, query, lang="ko", top_k=5):
+        # WikipediaRetriever와 같은 모양의 Document
+        return [
+            Document(
+                page_content=page["content"][: self.settings["doc_content_chars_max"]],
+                metadata={"title": page["title"], "summary": page["summary"], "source": page["source"]},
+            )
+            for page in self.search(query, lang, top_k)
+        ]
+
+    def text(self, query, lang="en", top_k=3):
+        # WikipediaAPIWrapper.run과 같은 형식의 요약 문자열
+        pages = self.search(query, lang, top_k)
+        if not pages:
+            return NO_RESULT
+        summaries = [f"Page: {page['title']}\nSummary: {page['summary']}" for page in pages]
+        return "\n\n".join(summaries)[: self.settings["doc_content_chars_max"]]
+
+
+def get_wikipedia():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WikipediaClient()
+        return _client
@@ -0,0 +1,225 @@
+import bz2
+import gzip
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from xml.etree import ElementTree
+
+WIKI_DUMP_DIR = os.environ.get("WIKIPEDIA_DUMP_DIR", "./.cache/wikipedia_dump")
+# 제목이 맞는 문서가 본문에만 단어가 나오는 문서보다 앞에 오도록 가중치를 둔다
+TITLE_WEIGHT = 10.0
+INSERT_BATCH = 1000
+
+NON_ARTICLE_LINK = re.compile(
+    r"\[\[(?:file|image|category|media|파일|그림|분류):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]",
+    re.IGNORECASE,
+)
+
+
+def dump_path(lang, root=WIKI_DUMP_DIR):
+    return os.path.join(root, f"{lang}.sqlite")
+
+
+def open_dump_file(source):
+    if source.endswith(".bz2"):
+        return bz2.open(source, "rb")
+    if source.endswith(".gz"):
+        return gzip.open(source, "rb")
+    return open(source, "rb")
+
+
+def strip_nested(text, pattern):
+    # 중첩된 틀({{...{{...}}...}})은 안쪽부터 여러 번 지운다
+    for _ in range(10):
+        text, count = pattern.subn("", text)
+        if not count:
+            break
+    return text
+
+
+def wikitext_to_text(text):
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    text = re.sub(r"<ref[^>/]*/>", "", text)
+    text = re.sub(r"<ref[^>]*>.*?</ref>", "", text, flags=re.DOTALL)
+    text = strip_nested(text, re.compile(r"\{\{[^{}]*\}\}"))
+    text = strip_nested(text, re.compile(r"\{\|(?:(?!\{\|).)*?\|\}", re.DOTALL))
+    text = NON_ARTICLE_LINK.sub("", text)
+    text = re.sub(r"\[\[[^\[\]|]*\|([^\[\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[\[([^\[\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[https?://[^\s\]]+ ([^\]]*)\]", r"\1", text)
+    text = re.sub(r"\[https?://[^\]]*\]", "", text)
+    text = re.sub(r"'{2,}", "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = html.unescape(text)
+    lines = [line.strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def iter_xml_articles(f):
+    # MediaWiki export XML. 일반 문서(ns 0)만 쓰고 넘겨주기 문서는 건너뛴다
+    title = ns = text = None
+    redirect = False
+    events = ElementTree.iterparse(f, events=("start", "end"))
+    _, root = next(events)
+    for event, element in events:
+        if event != "end":
+            continue
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "title":
+            title = element.text
+        elif tag == "ns":
+            ns = element.text
+        elif tag == "redirect":
+            redirect = True
+        elif tag == "text":
+            text = element.text or ""
+        elif tag == "page":
+            if title and ns in (None, "0") and not redirect and text is not None:
+                yield title, wikitext_to_text(text), None
+            title = ns = text = None
+            redirect = False
+            # 다 읽은 page를 루트에서 떼어내야 덤프가 커도 메모리가 늘지 않는다
+            root.clear()
+
+
+def iter_jsonl_articles(f):
+    # wikiextractor --json 형식: {"id", "url", "title", "text"}
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        article = json.loads(line)
+        if article.get("title") and article.get("text"):
+            yield article["title"], article["text"], article.get("url")
+
+
+def iter_dump_articles(source):
+    with open_dump_file(source) as f:
+        if ".json" in os.path.basename(source):
+            yield from iter_jsonl_articles(f)
+        else:
+            yield from iter_xml_articles(f)
+
+
+def build_dump_index(source, lang, path=None):
+    """Ingest a Wikipedia XML or JSONL dump into a local index for ``lang``.
+
+    Article text is stored zlib-compressed next to a title index and a
+    contentless FTS5 index, so the file stays close to the compressed dump
+    while lookups need no network. The index is built into a temporary file
+    and swapped in at the end. Returns the number of articles.
+    """
+    path = path or dump_path(lang)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(
+        """
+        CREATE TABLE articles (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            url TEXT NOT NULL,
+            body BLOB NOT NULL
+        );
+        CREATE VIRTUAL TABLE articles_fts USING fts5(
+            title, text, content='', tokenize='unicode61'
+        );
+        """
+    )
+    count = 0
+    with conn:
+        for title, text, url in iter_dump_articles(source):
+            url = url or f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO articles (title, url, body) VALUES (?, ?, ?)",
+                (title, url, zlib.compress(text.encode("utf-8"))),
+            )
+            if not cursor.rowcount:
+                continue
+            conn.execute(
+                "INSERT INTO articles_fts (rowid, title, text) VALUES (?, ?, ?)",
+                (cursor.lastrowid, title, text),
+            )
+            count += 1
+            if count % INSERT_BATCH == 0:
+                conn.commit()
+    conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+class WikipediaDump:
+    """Read side of a dump index built by ``build_dump_index``."""
+
+    def __init__(self, path):
+        self.path = path
+        # sqlite 연결은 스레드끼리 공유할 수 없으므로 스레드마다 따로 연다
+        self.local = threading.local()
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self.local.conn = conn
+        return conn
+
+    def search_ids(self, query, top_k):
+        conn = self.connect()
+        ids = [i for (i,) in conn.execute("SELECT id FROM articles WHERE title = ?", (query.strip(),))]
+        terms = [f'"{term}"*' for term in re.findall(r"\w+", query.lower())]
+        # 모든 단어가 들어간 문서를 먼저 찾고, 모자라면 한 단어라도 들어간 문서로 채운다
+        for operator in (" AND ", " OR "):
+            if len(ids) >= top_k or not terms:
+                break
+            rows = conn.execute(
+                "SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? ORDER BY bm25(articles_fts, ?, 1.0) LIMIT ?",
+                (operator.join(terms), TITLE_WEIGHT, top_k + len(ids)),
+            )
+            ids += [i for (i,) in rows if i not in ids]
+            if len(terms) == 1:
+                break
+        return ids[:top_k]
+
+    def search(self, query, top_k=5):
+        ids = self.search_ids(query, top_k)
+        if not ids:
+            return []
+        rows = self.connect().execute(
+            f"SELECT id, title, url, body FROM articles WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+        pages = {}
+        for i, title, url, body in rows:
+            content = zlib.decompress(body).decode("utf-8")
+            pages[i] = {
+                "title": title,
+                "summary": content.split("\n==", 1)[0].strip(),
+                "content": content,
+                "source": url,
+            }
+        return [pages[i] for i in ids if i in pages]
+
+
+if __name__ == "__main__":
+    # python -m utils.wiki_dump <dump.xml[.bz2] | dump.jsonl[.gz]> <lang> [query]
+    import sys
+    import time
+
+    source, lang = sys.argv[1], sys.argv[2]
+    start = time.perf_counter()
+    count = build_dump_index(source, lang)
+    print(f"{count} articles in {time.perf_counter() - start:.1f}s -> {dump_path(lang)} ({os.path.getsize(dump_path(lang)) / 1024 / 1024:.1f} MB)")
+    if len(sys.argv) > 3:
+        start = time.perf_counter()
+        pages = WikipediaDump(dump_path(lang)).search(sys.argv[3])
+        print(f"{(time.perf_counter() - start) * 1000:.1f} ms:", [page["title"] for page in pages])